@@ -1,6 +1,9 @@
 from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 
+# Werkzeug hash method for new passwords; tests lower the cost, stored hashes carry their own
+_PASSWORD_HASH_METHOD = "scrypt"
+
 
 class Admin(UserMixin):
     def __init__(self, username, password, api_key='', twilio_sid='', twilio_token=''):
@@ -28,7 +31,7 @@ class Admin(UserMixin):
         if self._looks_like_hash(raw_password):
             self.password_hash = raw_password
             return
-        self.password_hash = generate_password_hash(raw_password)
+        self.password_hash = generate_password_hash(raw_password, method=_PASSWORD_HASH_METHOD)
 
     def update_settings(self, api_key, twilio_sid, twilio_token):
         self.api_key = api_key
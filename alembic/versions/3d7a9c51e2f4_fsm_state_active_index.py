@@ -0,0 +1,33 @@
+"""partial index for active fsm states
+
+Revision ID: 3d7a9c51e2f4
+Revises: 8c1f4e2b7a90
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7a9c51e2f4'
+down_revision: Union[str, Sequence[str], None] = '8c1f4e2b7a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_fsm_state_active',
+        'fsm_state',
+        ['phone_number'],
+        postgresql_where=sa.text("statename NOT IN ('done', 'stop', 'pause')"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_fsm_state_active', table_name='fsm_state')
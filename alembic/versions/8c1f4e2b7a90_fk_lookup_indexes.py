@@ -0,0 +1,38 @@
+"""index foreign key lookup columns
+
+Revision ID: 8c1f4e2b7a90
+Revises: 5210a2308efa
+Create Date: 2026-10-15 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1f4e2b7a90'
+down_revision: Union[str, Sequence[str], None] = '5210a2308efa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_message_phone_sent_at', 'message', ['phone_number', 'sent_at', 'message_id'])
+    op.create_index('ix_message_phone_message_id', 'message', ['phone_number', 'message_id'])
+    op.create_index('ix_message_twilio_sid', 'message', ['twilio_sid'])
+    op.create_index('ix_twilio_message_phone_sent_at', 'twilio_message', ['phone_number', 'sent_at'])
+    op.create_index('ix_usage_twilio_sid', 'usage', ['twilio_sid'])
+    op.create_index('ix_test_case_run_id', 'test_case', ['run_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_test_case_run_id', table_name='test_case')
+    op.drop_index('ix_usage_twilio_sid', table_name='usage')
+    op.drop_index('ix_twilio_message_phone_sent_at', table_name='twilio_message')
+    op.drop_index('ix_message_twilio_sid', table_name='message')
+    op.drop_index('ix_message_phone_message_id', table_name='message')
+    op.drop_index('ix_message_phone_sent_at', table_name='message')
@@ -1,5 +1,6 @@
 import json
 import logging
+import threading
 # app.py
 from datetime import datetime, timezone
 from flask import Flask, request, render_template, redirect, url_for, current_app, make_response, jsonify
@@ -15,6 +16,7 @@ from dotenv import load_dotenv
 
 from admin import Admin
 from db import DB
+from fsm import STATES
 from models import FSMState
 from gpt import GPTClient, GPTServiceError
 from logging_config import configure_logging
@@ -24,6 +26,9 @@ from user_context import UserContext
 
 csrf = CSRFProtect()
 
+# Webhook turns for one phone are serialized on one of a fixed set of locks
+_CONVERSATION_LOCK_STRIPES = 64
+
 
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
@@ -102,6 +107,9 @@ def create_app() -> Flask:
         max_active_conversations=reach_out_limit,
     )
     app.config["services"] = services
+    # Striped locks serialize overlapping webhooks for the same conversation within this worker;
+    # a fixed pool keeps memory bounded no matter how many numbers text in
+    app.config["conversation_locks"] = tuple(threading.Lock() for _ in range(_CONVERSATION_LOCK_STRIPES))
 
     # ----------------------------
     # Helpers (no globals)
@@ -109,6 +117,11 @@ def create_app() -> Flask:
     def get_services():
         return current_app.config["services"]
 
+    def conversation_lock(phone: str) -> threading.Lock:
+        # A phone always maps to the same stripe; unrelated phones rarely share one
+        locks = current_app.config["conversation_locks"]
+        return locks[hash(phone) % len(locks)]
+
     def _parse_int(value, default=None):
         if value is None:
             return default
@@ -355,30 +368,32 @@ def create_app() -> Flask:
 
                 reply = "Messages Stopped"
             else:
-                # Build a proper UserContext (fixes the previous string misuse)
-                user_ctx = UserContext(str(from_number))
-                reply_user_ctx = user_ctx
+                # Overlapping messages from one phone would otherwise race on its FSM state and history
+                with conversation_lock(str(from_number)):
+                    # Build a proper UserContext (fixes the previous string misuse)
+                    user_ctx = UserContext(str(from_number))
+                    reply_user_ctx = user_ctx
 
-                # Generate reply via GPT
-                try:
-                    reply = gpt.generate_response(incoming_msg, user_ctx, db)
-                except GPTServiceError as exc:
-                    fallback_reply = current_app.config.get(
-                        "GPT_FALLBACK_MESSAGE",
-                        "Sorry, we're having trouble replying automatically.",
-                    )
-                    current_app.logger.warning(
-                        "GPT service unavailable for %s, using fallback message.",
-                        from_number,
-                        exc_info=exc,
-                    )
-                    reply = fallback_reply
-                except Exception as exc:
-                    current_app.logger.exception(
-                        "Unexpected failure generating response for %s",
-                        from_number,
-                    )
-                    return ("Internal server error.", 500)
+                    # Generate reply via GPT
+                    try:
+                        reply = gpt.generate_response(incoming_msg, user_ctx, db)
+                    except GPTServiceError as exc:
+                        fallback_reply = current_app.config.get(
+                            "GPT_FALLBACK_MESSAGE",
+                            "Sorry, we're having trouble replying automatically.",
+                        )
+                        current_app.logger.warning(
+                            "GPT service unavailable for %s, using fallback message.",
+                            from_number,
+                            exc_info=exc,
+                        )
+                        reply = fallback_reply
+                    except Exception as exc:
+                        current_app.logger.exception(
+                            "Unexpected failure generating response for %s",
+                            from_number,
+                        )
+                        return ("Internal server error.", 500)
 
             # Send reply out-of-band via Twilio REST
             if reply and int(os.getenv("OUTBOUND_LIVE_TOGGLE", 0)) == 1:
@@ -399,6 +414,7 @@ def create_app() -> Flask:
                                 direction="outbound",
                                 body=reply,
                                 sent_at=sent_at,
+                                commit=False,
                             )
                         if reply_user_ctx is not None:
                             gpt.insert_with_db_instance(db, reply, reply_user_ctx, twilio_sid=twilio_sid)
@@ -600,8 +616,7 @@ def create_app() -> Flask:
     @app.route('/conversations/<phone>/edit', methods=['GET', 'POST'])
     @login_required
     def conversation_edit(phone):
-        allowed_states = ['start', 'interested', 'action_sqft', 'confused', 'not_interested', 'follow_up', 'pause',
-                          'stop', 'done']
+        allowed_states = STATES
         interested_states = {'interested', 'action_sqft'}
         db = DB()
 
@@ -653,6 +668,7 @@ def create_app() -> Flask:
                                         direction="outbound",
                                         body=stop_reply,
                                         sent_at=datetime.now(timezone.utc),
+                                        commit=False,
                                     )
                                 db.insert_message_from_gpt(phone, stop_reply, twilio_sid=twilio_sid)
                         except Exception as send_exc:
@@ -4,14 +4,14 @@ import atexit
 import logging
 import os
 import threading
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Sequence, Union
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, exists, func, inspect, or_, select
+from sqlalchemy import create_engine, exists, func, insert, inspect, or_, select
 from sqlalchemy.engine import Engine, URL
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session, contains_eager, sessionmaker
 
 from models import (
     Base,
@@ -129,17 +129,22 @@ def _resolve_pool_class():
             "null": NullPool,
         }.get(choice, NullPool)
 
-    if any(
-            flag is True
-            for flag in (
-                    _env_flag("SQLALCHEMY_POOL_ENABLED"),
-                    _env_flag("SQLALCHEMY_QUEUE_POOL"),
-                    _env_flag("DB_POOL_ENABLED"),
-            )
-    ):
+    flags = (
+        _env_flag("SQLALCHEMY_POOL_ENABLED"),
+        _env_flag("SQLALCHEMY_QUEUE_POOL"),
+        _env_flag("DB_POOL_ENABLED"),
+    )
+    if any(flag is True for flag in flags):
         return QueuePool
+    if any(flag is False for flag in flags):
+        return NullPool
+
+    # PgBouncer already pools server connections; don't stack a client-side pool on top
+    if os.getenv("PGBOUNCER_DSN"):
+        return NullPool
 
-    return NullPool
+    # Reuse connections by default so each DB() skips the TCP/TLS/auth handshake
+    return QueuePool
 
 
 def get_engine() -> Engine:
@@ -160,6 +165,9 @@ def get_engine() -> Engine:
             engine_kwargs["echo"] = True
 
         pre_ping_flag = _env_flag("SQLALCHEMY_POOL_PRE_PING")
+        if pre_ping_flag is None and pool_class is not None and pool_class.__name__ == "QueuePool":
+            # Pooled connections can outlive a server restart; check them on checkout
+            pre_ping_flag = True
         if pre_ping_flag is not None:
             engine_kwargs["pool_pre_ping"] = pre_ping_flag
 
@@ -182,6 +190,13 @@ def get_engine() -> Engine:
                 engine_kwargs["pool_timeout"] = int(pool_timeout)
             except ValueError:
                 engine_kwargs["pool_timeout"] = 30
+            pool_recycle = os.getenv("SQLALCHEMY_POOL_RECYCLE") or "1800"
+            try:
+                engine_kwargs["pool_recycle"] = int(pool_recycle)
+            except ValueError:
+                engine_kwargs["pool_recycle"] = 1800
+            # LIFO checkout keeps reusing the few warm connections and lets surplus ones idle out
+            engine_kwargs["pool_use_lifo"] = True
 
         _engine = create_engine(url, **engine_kwargs)
         return _engine
@@ -242,11 +257,11 @@ class DB:
             self.session.flush()
         return phone_row
 
-    def quick_query(self) -> None:
+    def quick_query(self) -> List[tuple[str, str]]:
         bind = self.session.get_bind()
         if bind is None:
             logger.debug("quick_query: no database bind available; returning empty result")
-            return
+            return []
         inspector = inspect(bind)
         tables: List[tuple[str, str]] = []
         for schema in inspector.get_schema_names():
@@ -255,6 +270,7 @@ class DB:
             for table in inspector.get_table_names(schema=schema):
                 tables.append((schema, table))
         logger.debug("quick_query tables: %s", tables)
+        return tables
 
     def insert_message(self, phone: str, user_input: str, twilio_sid: Optional[str] = None) -> None:
         self._ensure_phone(phone)
@@ -264,7 +280,7 @@ class DB:
             direction="inbound",
             body=user_input,
             message_data={"role": "user", "content": user_input},
-            sent_at=datetime.utcnow(),
+            sent_at=datetime.now(timezone.utc),
         )
         self.session.add(message)
         self.session.commit()
@@ -276,7 +292,7 @@ class DB:
             body=gpt_input,
             twilio_sid=twilio_sid,
             message_data={"role": "developer", "content": gpt_input},
-            sent_at=datetime.utcnow(),
+            sent_at=datetime.now(timezone.utc),
         )
         self.session.add(message)
         self.session.commit()
@@ -288,8 +304,13 @@ class DB:
             direction: str,
             body: Optional[str],
             sent_at: Optional[datetime] = None,
+            commit: bool = True,
     ) -> None:
-        """Persist a TwilioMessage row linked to the phone number."""
+        """
+        Persist a TwilioMessage row linked to the phone number.
+        With commit=False the row is only flushed, so the caller's next commit
+        (typically the matching Message insert) writes both in one transaction.
+        """
         session = getattr(db_connection, "session", db_connection)
         ensure_phone = getattr(db_connection, "_ensure_phone", None)
         if callable(ensure_phone):
@@ -300,10 +321,13 @@ class DB:
             phone_number=phone_number,
             direction=direction,
             body=body,
-            sent_at=sent_at or datetime.utcnow(),
+            sent_at=sent_at or datetime.now(timezone.utc),
         )
         session.add(record)
-        session.commit()
+        if commit:
+            session.commit()
+        else:
+            session.flush()
 
     def SQL_latest_message_per_phone(self):
         stmt = (
@@ -466,7 +490,9 @@ class DB:
         stmt = (
             select(Contact)
             .join(Phone, Phone.phone_number == Contact.phone_number, isouter=True)
-            .join(FSMState, FSMState.phone_number == Contact.phone_number, isouter=True)
+            .join(FSMState, FSMState.phone_number == Phone.phone_number, isouter=True)
+            # Populate contact.phone.fsm_state from the joins above instead of two lazy loads per contact
+            .options(contains_eager(Contact.phone).contains_eager(Phone.fsm_state))
             .where(
                 Contact.phone_number.isnot(None),
                 Contact.phone_number != "",
@@ -570,4 +596,20 @@ def insert_test_case(
     return case.case_id
 
 
+def insert_test_cases(
+        db_connection: "DB",
+        cases: Sequence[Dict[str, Any]],
+        commit: bool = True,
+) -> None:
+    """
+    Persist many test_case rows with one multi-row INSERT.
+    With commit=False the rows ride along with the caller's next commit.
+    """
+    if not cases:
+        return
+    db_connection.session.execute(insert(TestCase), list(cases))
+    if commit:
+        db_connection.session.commit()
+
+
 atexit.register(dispose_engine)
@@ -1,6 +1,5 @@
 import logging
-
-from transitions import Machine, State
+from functools import partialmethod
 
 from logging_config import configure_logging
 
@@ -8,51 +7,96 @@ from logging_config import configure_logging
 logger = logging.getLogger(__name__)
 
 
+class MachineError(Exception):
+    """Raised when a trigger is not valid from the current state."""
+
+
+STATES = (
+    'start',
+    'interested',
+    'action_sqft',
+    'confused',
+    'not_interested',
+    'follow_up',
+    'pause',
+    'stop',
+    'done',
+)
+
+
 class IntentionFlow:
-    states = [
-        State(name='start'),
-        State(name='interested', on_enter=['mark_interested']),
-        State(name='action_sqft', on_enter=['mark_interested']),
-        State(name='confused'),
-        State(name='not_interested'),
-        State(name='follow_up'),
-        State(name='pause'),
-        State(name='stop'),
-        State(name='done'),
-    ]
+    states = STATES
+
+    # (source, trigger) -> dest; '*' matches any source state
+    _TRANSITIONS = {
+        ('start', 'receive_positive_response'): 'interested',
+        ('confused', 'receive_positive_response'): 'interested',
+        ('pause', 'receive_positive_response'): 'interested',
+        ('interested', 'go_to_sqft'): 'action_sqft',
+        ('start', 'go_to_sqft'): 'action_sqft',
+        ('confused', 'go_to_sqft'): 'action_sqft',
+        ('action_sqft', 'receive_followup'): 'follow_up',
+        ('interested', 'receive_followup'): 'follow_up',
+        ('follow_up', 'complete_flow'): 'done',
+        ('*', 'receive_negative_response'): 'not_interested',
+        ('*', 'user_stopped'): 'stop',
+        ('*', 'retry_confused'): 'confused',
+        ('confused', 'pause_flow'): 'pause',
+        ('pause', 'resume_flow'): 'start',
+        ('follow_up', 'polite_ack'): 'done',
+    }
+    triggers = tuple(dict.fromkeys(trigger for _, trigger in _TRANSITIONS))
+    MAX_CONFUSED = 3
+
+    __slots__ = ('name', 'state', 'confused_count', 'was_ever_interested', 'flow_version')
 
     def __init__(self, name):
         self.name = name
+        self.state = 'start'
         self.confused_count = 0
         self.was_ever_interested = False
         self.flow_version = 1
-        self.machine = Machine(model=self, states=IntentionFlow.states, initial='start')
-
-        # Define transitions
-        self.machine.add_transition(trigger='receive_positive_response', source=['start', 'confused', 'pause'], dest='interested')
-        self.machine.add_transition(trigger='go_to_sqft', source=['interested', 'start', 'confused'], dest='action_sqft')
-        self.machine.add_transition(trigger='receive_followup', source=['action_sqft', 'interested'], dest='follow_up')
-        self.machine.add_transition(trigger='complete_flow', source='follow_up', dest='done')
-        self.machine.add_transition(trigger='receive_negative_response', source='*', dest='not_interested')
-        self.machine.add_transition(trigger='user_stopped', source='*', dest='stop')
-        self.machine.add_transition(trigger='retry_confused', source='*', dest='confused', after='increment_confused')
-        self.machine.add_transition(trigger='pause_flow', source='confused', dest='pause', conditions='max_confused')
-        self.machine.add_transition(trigger='resume_flow', source='pause', dest='start')
-
-        #
-        self.machine.add_transition(trigger='polite_ack', source='follow_up', dest='done')
+
+    def trigger(self, name, *args, **kwargs) -> bool:
+        """
+        Fire `name` from the current state. Returns False when a guard
+        condition blocks the transition; raises MachineError if the trigger
+        is not valid from the current state.
+        """
+        dest = self._TRANSITIONS.get((self.state, name)) or self._TRANSITIONS.get(('*', name))
+        if dest is None:
+            raise MachineError(f"Can't trigger event {name} from state {self.state}!")
+
+        condition = self._CONDITIONS.get(name)
+        if condition is not None and not condition(self):
+            return False
+
+        self.state = dest
+        on_enter = self._ON_ENTER.get(dest)
+        if on_enter is not None:
+            on_enter(self)
+        after = self._AFTER.get(name)
+        if after is not None:
+            after(self)
+        return True
+
+    @classmethod
+    def get_triggers(cls, state) -> frozenset[str]:
+        # Unknown states (e.g. legacy DB values) only get the wildcard triggers, matching trigger()
+        return cls._TRIGGERS_BY_STATE.get(state) or cls._TRIGGERS_BY_STATE['*']
 
     def mark_interested(self):
         self.was_ever_interested = True
 
     def increment_confused(self):
-        self.confused_count += 1
-        if self.max_confused():
+        count = self.confused_count + 1
+        self.confused_count = count
+        if count >= self.MAX_CONFUSED:
             # auto-pause if limit reached
             self.pause_flow()
 
     def max_confused(self):
-        return self.confused_count >= 3
+        return self.confused_count >= self.MAX_CONFUSED
 
     # in your IntentionFlow class, add:
     def snapshot(self) -> dict:
@@ -62,6 +106,25 @@ class IntentionFlow:
             "was_ever_interested": getattr(self, "was_ever_interested", False),
         }
 
+    # Hooks are stored as plain functions so trigger() calls them directly
+    _CONDITIONS = {'pause_flow': max_confused}
+    _AFTER = {'retry_confused': increment_confused}
+    _ON_ENTER = {
+        'interested': mark_interested,
+        'action_sqft': mark_interested,
+    }
+
+
+for _trigger in IntentionFlow.triggers:
+    setattr(IntentionFlow, _trigger, partialmethod(IntentionFlow.trigger, _trigger))
+del _trigger
+
+# The transition table is static, so the triggers valid from each state are computed once
+IntentionFlow._TRIGGERS_BY_STATE = {
+    state: frozenset(trigger for (source, trigger) in IntentionFlow._TRANSITIONS if source in (state, '*'))
+    for state in STATES + ('*',)
+}
+
 
 def simulate_all_paths():
     logger.info("=== Positive Happy Path ===")
@@ -1,20 +1,23 @@
 import json
+import logging
 import pathlib
-from datetime import datetime
 from collections import defaultdict
+from datetime import datetime, timezone
 
 from dotenv import load_dotenv
 import os
 from openai import OpenAI
+from sqlalchemy import insert
 
-import main_intent
-from control_session import get_session_messages, get_session_messages_no_base_prompt
+from control_session import get_session_messages_no_base_prompt
 from main_intent import tool_get_fsm_reply, tool_get_user_context, tool_update_fsm
 from models import Message
 from user_context import UserContext
 
 load_dotenv()  # This loads variables from .env into os.environ
 
+logger = logging.getLogger(__name__)
+
 
 class GPTServiceError(RuntimeError):
     """Raised when the upstream GPT service fails or is unavailable."""
@@ -22,18 +25,17 @@ class GPTServiceError(RuntimeError):
 
 class GPTClient:
     def __init__(self, temperature: float = 0.0, max_tokens: int = 512):
-        path = pathlib.Path(os.getenv("BASE_PROMPT_FILE", "./base_prompt.txt"))
-        base_prompt = path.read_text(encoding="utf-8") if path.exists() else ""
-
         self._api_key = os.getenv("OPENAI_API_KEY")
         self._organization = os.getenv("OPENAI_ORG")
         self._client = OpenAI(api_key=self._api_key, organization=self._organization)
         self._model = "gpt-4o-mini"
-        self._base_instructions = base_prompt
+        # Base prompt and tool schema are read once per process (bottom of module)
+        self._base_instructions = _BASE_PROMPT
+        self._system_message = _SYSTEM_MSG
         self._contexts = defaultdict(list)
         self._temperature = temperature
         self._max_tokens = max_tokens
-        self._tools = load_tools()
+        self._tools = _TOOLS
 
     # Getters
     def get_base_instructions(self):
@@ -56,6 +58,7 @@ class GPTClient:
     # Setters
     def set_base_instructions(self, instructions: str):
         self._base_instructions = instructions
+        self._system_message = {"role": "system", "content": instructions}
 
     def set_temperature(self, temperature: float):
         self._temperature = temperature
@@ -102,42 +105,45 @@ class GPTClient:
     # Call GPT model
     def generate_response(self, user_input: str, user: UserContext, db_instance):
         phone = user.phone_number
-        context_messages = list(self._contexts.get(phone, []))
-        messages = [{"role": "system", "content": self._base_instructions}] + context_messages
-        append_user_turn = True
+        messages = [self._system_message]
+        previous_messages = []
         try:
             if db_instance:
                 previous_messages = get_session_messages_no_base_prompt(db_instance, user.phone_number)
                 previous_messages = list(reversed(previous_messages))
-                messages.extend(previous_messages)
-                if previous_messages:
-                    last_message = previous_messages[-1]
-                    if (
-                        isinstance(last_message, dict)
-                        and last_message.get("role") == "user"
-                        and last_message.get("content") == user_input
-                    ):
-                        append_user_turn = False
-                    else:
-                        append_user_turn = True
-                else:
-                    append_user_turn = True
-        except Exception as e:
-            print(e)
+        except Exception:
+            logger.exception("Failed to load session history for %s", phone)
+
+        if previous_messages:
+            # Persisted history already holds the logged assistant replies. Keeping it directly behind
+            # the static system prompt gives OpenAI's prompt cache a byte-stable prefix between turns.
+            messages.extend(previous_messages)
+            last_message = previous_messages[-1]
+            append_user_turn = not (
+                isinstance(last_message, dict)
+                and last_message.get("role") == "user"
+                and last_message.get("content") == user_input
+            )
+        else:
+            # No DB history available: fall back to the in-memory context
+            messages.extend(self._contexts.get(phone, []))
+            append_user_turn = True
 
         if append_user_turn:
             messages.append({"role": "user", "content": user_input})
 
         force_tool_next = False  # <- set when we reject/no-op a transition
 
+        # Only tool_choice varies between rounds; `messages` is extended in place
+        request = {
+            "messages": messages,
+            "temperature": self._temperature,
+            "max_tokens": self._max_tokens,
+            "tools": self._tools,
+        }
+
         # first turn: must use tools
-        response = self._chat_completion(
-            messages=messages,
-            temperature=self._temperature,
-            max_tokens=self._max_tokens,
-            tools=self._tools,
-            tool_choice="required",
-        )
+        response = self._chat_completion(**request, tool_choice="required")
 
         while True:
             choice = response.choices[0]
@@ -145,18 +151,8 @@ class GPTClient:
 
             # If the model requested tool calls
             if msg.tool_calls:
-                # record the assistant "tool request" message
-                messages.append({
-                    "role": "assistant",
-                    "content": None,
-                    "tool_calls": [
-                        {
-                            "id": c.id,
-                            "type": "function",
-                            "function": {"name": c.function.name, "arguments": c.function.arguments}
-                        } for c in msg.tool_calls
-                    ]
-                })
+                # record the assistant "tool request" message (SDK model already matches the wire format)
+                messages.append(msg.model_dump(exclude_none=True))
 
                 # reset for this round
                 force_tool_next = False
@@ -195,10 +191,7 @@ class GPTClient:
 
                 # Ask again after tools:
                 response = self._chat_completion(
-                    messages=messages,
-                    temperature=self._temperature,
-                    max_tokens=self._max_tokens,
-                    tools=self._tools,
+                    **request,
                     # If last update failed/no-op, REQUIRE a tool (e.g., read context, pick a valid trigger)
                     tool_choice="required" if force_tool_next else "auto",
                 )
@@ -207,13 +200,7 @@ class GPTClient:
             # No tool calls returned by the model
             if force_tool_next:
                 # Model skipped tools right after a rejected/no-op update: force a tool pass
-                response = self._chat_completion(
-                    messages=messages,
-                    temperature=self._temperature,
-                    max_tokens=self._max_tokens,
-                    tools=self._tools,
-                    tool_choice="required",
-                )
+                response = self._chat_completion(**request, tool_choice="required")
                 # clear after forcing a retry
                 force_tool_next = False
                 continue
@@ -229,8 +216,21 @@ class GPTClient:
         try:
             if db_instance:
                 log_message_to_db(db_instance, phone, reply, twilio_sid=twilio_sid)
-        except Exception as e:
-            print(e)
+        except Exception:
+            logger.exception("Failed to log assistant reply for %s", phone)
+
+    def log_many_with_db_instance(self, db_instance, replies):
+        """
+        Log several (phone, reply, sent_at) assistant messages with one INSERT and one commit.
+        Unlike insert_with_db_instance this leaves the in-memory context alone; callers append
+        each reply with add_to_context when it is sent.
+        """
+        replies = list(replies)
+        try:
+            if db_instance and replies:
+                log_messages_to_db(db_instance, replies)
+        except Exception:
+            logger.exception("Failed to log %d assistant replies", len(replies))
 
     def _chat_completion(
             self,
@@ -263,19 +263,38 @@ class GPTClient:
 
 
 def log_message_to_db(db_instance, phone_number: str, reply: str, twilio_sid: str | None = None):
-    """Log assistant reply to the message table."""
+    """Log assistant reply to the message table with a Core INSERT, stamped with the app-side UTC clock."""
     session = getattr(db_instance, "session", db_instance)
 
-    message = Message(
-        phone_number=phone_number,
-        direction='outbound',
-        body=reply,
-        twilio_sid=twilio_sid,
-        message_data={'role': 'assistant', 'content': reply},
-        sent_at=datetime.utcnow(),
+    session.execute(
+        insert(Message).values(
+            phone_number=phone_number,
+            direction='outbound',
+            body=reply,
+            twilio_sid=twilio_sid,
+            message_data={'role': 'assistant', 'content': reply},
+            sent_at=datetime.now(timezone.utc),
+        )
     )
+    session.commit()
+
+
+def log_messages_to_db(db_instance, replies):
+    """Log (phone_number, reply, sent_at) assistant messages as a single multi-row INSERT."""
+    session = getattr(db_instance, "session", db_instance)
 
-    session.add(message)
+    session.execute(
+        insert(Message).values([
+            {
+                "phone_number": phone_number,
+                "direction": 'outbound',
+                "body": reply,
+                "message_data": {'role': 'assistant', 'content': reply},
+                "sent_at": sent_at,
+            }
+            for phone_number, reply, sent_at in replies
+        ])
+    )
     session.commit()
 
 
@@ -301,3 +320,13 @@ def load_tools():
     if raw:
         return json.loads(raw)
     return []
+
+
+def _load_base_prompt() -> str:
+    path = pathlib.Path(os.getenv("BASE_PROMPT_FILE", "./base_prompt.txt"))
+    return path.read_text(encoding="utf-8") if path.exists() else ""
+
+
+_BASE_PROMPT = _load_base_prompt()
+_SYSTEM_MSG = {"role": "system", "content": _BASE_PROMPT}
+_TOOLS = load_tools()
@@ -1,19 +1,36 @@
+import atexit
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 LOG_FORMAT = (
     "[%(asctime)s] %(levelname)s in %(filename)s:%(lineno)d (%(funcName)s): %(message)s"
 )
 
+_listener: QueueListener | None = None
+
 
 def configure_logging() -> None:
-    """Configure root logging with a consistent stream handler and format."""
+    """Configure root logging; records are queued and written to stderr on a background thread."""
+    global _listener
     root_logger = logging.getLogger()
 
     if not root_logger.handlers:
+        # The format does not use thread/process fields, so skip collecting them per record
+        logging.logThreads = False
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
         handler = logging.StreamHandler()
         handler.setFormatter(logging.Formatter(LOG_FORMAT))
-        root_logger.addHandler(handler)
+
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root_logger.addHandler(QueueHandler(log_queue))
+        _listener = QueueListener(log_queue, handler)
+        _listener.start()
+        # Drain pending records before the interpreter exits
+        atexit.register(_listener.stop)
 
     level_name = os.getenv("LOG_LEVEL", "INFO").upper()
     try:
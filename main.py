@@ -3,8 +3,9 @@ from __future__ import annotations
 import logging
 import os
 import sys
-from dataclasses import dataclass
-from typing import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, ClassVar
 
 from dotenv import load_dotenv
 
@@ -19,6 +20,8 @@ from user_context import UserContext
 configure_logging()
 logger = logging.getLogger(__name__)
 
+_EXIT_COMMANDS = frozenset({"exit", "quit", "stop"})
+
 
 def _env_flag(name: str, default: bool = False) -> bool:
     value = os.getenv(name)
@@ -60,20 +63,60 @@ def build_user(phone: str) -> UserContext:
 
 
 # ---------- app core ----------
-@dataclass
+# Not frozen: reset_state() swaps in a fresh UserContext and flush_writes() swaps the pending list
+@dataclass(slots=True)
 class ConversationApp:
     phone: str
     gpt: GPTClient
     user: UserContext
     db_factory: Callable[[], DB] = DB
     intro_message: str | None = None
+    _EXIT_STATES: ClassVar[frozenset[str]] = frozenset({"pause", "stop", "complete_flow", "user_stopped"})
+    # Single writer thread keeps message inserts in arrival order, off the turn's critical path
+    _writer: ThreadPoolExecutor = field(
+        default_factory=lambda: ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer"),
+        init=False,
+        repr=False,
+    )
+    _pending_writes: list[Future] = field(default_factory=list, init=False, repr=False)
+
+    def _submit_write(self, fn: Callable[..., None], *args) -> None:
+        self._pending_writes.append(self._writer.submit(fn, *args))
+
+    def flush_writes(self) -> None:
+        """Block until every queued DB write has finished."""
+        pending, self._pending_writes = self._pending_writes, []
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Background DB write failed for %s", self.phone)
+
+    def close(self) -> None:
+        self.flush_writes()
+        self._writer.shutdown(wait=True)
+
+    def _insert_user_message(self, text: str) -> None:
+        with self.db_factory() as db:
+            db.insert_message(self.phone, text)
+
+    def _insert_gpt_message(self, text: str) -> None:
+        with self.db_factory() as db:
+            db.insert_message_from_gpt(self.phone, text)
+
+    def _insert_reply(self, reply: str) -> None:
+        with self.db_factory() as db:
+            self.gpt.insert_with_db_instance(db, reply, self.user)
 
     def reset_state(self) -> None:
         """Reset persisted state for this phone and clear GPT context."""
+        self.flush_writes()
+        # One round-trip: the message delete rides along as a data-modifying CTE
+        deleted_messages = delete(Message).where(Message.phone_number == self.phone).cte("deleted_messages")
+        stmt = delete(FSMState).where(FSMState.phone_number == self.phone).add_cte(deleted_messages)
         with self.db_factory() as db:
             session = db.session
-            session.execute(delete(Message).where(Message.phone_number == self.phone))
-            session.execute(delete(FSMState).where(FSMState.phone_number == self.phone))
+            session.execute(stmt)
             session.commit()
 
         self.gpt.set_context(self.phone, [])
@@ -83,23 +126,26 @@ class ConversationApp:
         # ensure context is empty and FSM row exists if needed
         self.gpt.set_context(self.phone, [])
         try:
-            self.user.get_current_state()
+            self.user.get_current_state(refresh=True)
         except Exception:
             pass
 
     def should_exit_stateful(self) -> bool:
-        return self.user.get_current_state() in {"pause", "complete_flow", "user_stopped"}
+        # Re-read the row: the admin UI and the webhook STOP path write fsm_state behind this long-lived user
+        return self.user.get_current_state(refresh=True) in self._EXIT_STATES
 
     def handle_stop(self, text: str) -> None:
         self.user.trigger_event("user_stopped", verbose=True)
-        with self.db_factory() as db:
-            db.insert_message(self.phone, text)
+        self._submit_write(self._insert_user_message, text)
 
     def handle_user_turn(self, text: str) -> str:
+        # The previous reply must be persisted before generate_response reads history
+        self.flush_writes()
+        # generate_response appends the user turn itself if this insert has not landed yet
+        self._submit_write(self._insert_user_message, text)
         with self.db_factory() as db:
-            db.insert_message(self.phone, text)
             reply = self.gpt.generate_response(text, self.user, db)
-            self.gpt.insert_with_db_instance(db, reply, self.user)
+        self._submit_write(self._insert_reply, reply)
         return reply
 
     def loop(self) -> None:
@@ -107,8 +153,7 @@ class ConversationApp:
         logger.info("--- GPT SMS Conversation Simulator ---")
 
         if self.intro_message:
-            with self.db_factory() as db:
-                db.insert_message_from_gpt(self.phone, self.intro_message)
+            self._submit_write(self._insert_gpt_message, self.intro_message)
             logger.info("GPT: %s", self.intro_message)
 
         while True:
@@ -118,7 +163,7 @@ class ConversationApp:
             user_input = input("You: ").strip()
             if not user_input:
                 continue
-            if user_input.lower() in {"exit", "quit", "stop"}:
+            if user_input.casefold() in _EXIT_COMMANDS:
                 self.handle_stop(user_input)
                 break
 
@@ -154,6 +199,8 @@ def main() -> None:
     except KeyboardInterrupt:
         logger.info("")
         logger.info("Exiting.")
+    finally:
+        app.close()
 
 
 if __name__ == "__main__":
@@ -1,25 +1,84 @@
 from __future__ import annotations
-import json
+import functools
 import logging
 
-from transitions.core import MachineError, EventData
+import orjson
+
+from fsm import MachineError
 from user_context import UserContext
 
 # Module-level logger for FSM operations
 fsm_logger = logging.getLogger(__name__)
 
+# Triggers the model may request; anything else an FSM reports is ignored
+EXPLICIT_TRIGGERS = frozenset({
+    'receive_positive_response',
+    'go_to_sqft',
+    'receive_followup',
+    'complete_flow',
+    'receive_negative_response',
+    'user_stopped',
+    'retry_confused',
+    'pause_flow',
+    'resume_flow',
+    'polite_ack',
+})
+
+NLU_HINT = (
+    "If current_state is 'follow_up', map acknowledgements like 'ok/thanks/got it' "
+    "to 'polite_ack' or 'complete_flow', not 'retry_confused'."
+)
+
+
+def _dumps(obj, option: int = 0) -> str:
+    # Tool results are fed straight back to the model as message content, which must be str
+    return orjson.dumps(obj, option=option).decode()
+
+
+@functools.lru_cache(maxsize=64)
+def _sorted_triggers(triggers: frozenset[str]) -> tuple[str, ...]:
+    # Trigger sets come from a static table, so each distinct set is only ever sorted once
+    return tuple(sorted(triggers))
+
+
+@functools.lru_cache(maxsize=32)
+def _context_template(state: str, triggers: frozenset[str]) -> dict:
+    """Per-state part of the user-context payload; the trigger list and hint never change for a state."""
+    return {
+        "current_state": state,
+        "allowed_triggers": _sorted_triggers(triggers),
+        "nlu_hint": NLU_HINT,
+    }
 
-def tool_get_user_context(user: UserContext):
-    snap = user.get_fsm_snapshot()
-    return json.dumps({
-        "current_state": user.get_current_state(),
-        "allowed_triggers": sorted(user.fsm.machine.get_triggers(user.get_current_state())),
+
+def _user_context_payload(user: UserContext) -> dict:
+    state = user.get_current_state()
+    template = _context_template(state, frozenset(user.fsm.get_triggers(state)))
+    return {
+        **template,
         "phone_number": user.phone_number,
         "user_data": user.user_data,
         "twilio_data": user.twilio_data,
-        "fsm": snap,
-        "nlu_hint": "If current_state is 'follow_up', map acknowledgements like 'ok/thanks/got it' to 'polite_ack' or 'complete_flow', not 'retry_confused'."
-    })
+        "fsm": user.get_fsm_snapshot(),
+    }
+
+
+def tool_get_user_context(user: UserContext):
+    # Sorted keys keep the tool output byte-stable between turns for the prompt cache
+    return _dumps(_user_context_payload(user), option=orjson.OPT_SORT_KEYS)
+
+
+# (state, requested event) -> (event to fire, coercion reason)
+_COERCIONS: dict[str, dict[str, tuple[str, str]]] = {
+    # When we are awaiting closure, treat short acks as completion.
+    # Explicit finishes (e.g. 'complete_flow') and back-outs pass through untouched.
+    "follow_up": {
+        event: ("polite_ack", "coerced_from_follow_up_ack")
+        for event in ("retry_confused", "receive_positive_response", "resume_flow")
+    },
+    "action_sqft": {"go_to_sqft": ("receive_followup", "coerced_from_gotosqft")},
+    "interested": {"go_to_sqft": ("receive_followup", "coerced_from_gotosqft_and_interested")},
+}
 
 
 # Helper: decide coercions based on current state + incoming event
@@ -28,58 +87,71 @@ def _coerce_event(state: str, event_name: str) -> tuple[str, str | None]:
     Returns (final_event_name, reason)
     reason is None if no coercion.
     """
-    # When we are awaiting closure, treat short acks as completion.
-    if state == "follow_up":
-        if event_name in {"retry_confused", "receive_positive_response", "resume_flow"}:
-            return "polite_ack", "coerced_from_follow_up_ack"
-        # Allow explicit finishes to pass through, e.g. 'complete_flow'
-        # Let 'receive_negative_response' fall through if you want to support back-outs.
-
-    # When we are awaiting closure, treat short acks as completion.
-    if state == "action_sqft":
-        if event_name in {"go_to_sqft"}:
-            return "receive_followup", "coerced_from_gotosqft"
-        # Allow explicit finishes to pass through, e.g. 'complete_flow'
-        # Let 'receive_negative_response' fall through if you want to support back-outs.
-
-    if state == "interested":
-        if event_name in {"go_to_sqft"}:
-            return "receive_followup", "coerced_from_gotosqft_and_interested"
+    table = _COERCIONS.get(state)
+    if table:
+        hit = table.get(event_name)
+        if hit:
+            return hit
 
     # In pause, only allow explicit stop; everything else should no-op or self-loop
-    if state == "pause":
-        if event_name not in {"user_stopped"}:
-            return event_name, "noop_if_invalid_in_pause"  # we'll no-op below if invalid
+    if state == "pause" and event_name != "user_stopped":
+        return event_name, "noop_if_invalid_in_pause"  # we'll no-op below if invalid
 
     return event_name, None
 
 
+def _failed_transition(reason: str, error: str, event: str, state: str, allowed: tuple[str, ...], snapshot: dict,
+                       log_info: bool = False) -> dict:
+    """Result for a transition that raised; the FSM stays in `state`."""
+    result = {
+        "applied": False,
+        "reason": reason,
+        "error": error,
+        "event": event,
+        "from_state": state,
+        "to_state": state,
+        "allowed_triggers": allowed,
+        "fsm": snapshot,
+    }
+    if log_info:
+        fsm_logger.info("Returning error result: %s", result)
+    return result
+
+
 def tool_update_fsm(user, event_name: str, kwargs=None, verbose: bool = True):
+    return _dumps(_update_fsm(user, event_name, kwargs, verbose))
+
+
+def _update_fsm(user, event_name: str, kwargs=None, verbose: bool = True) -> dict:
+    """Apply `event_name` (after coercion) and return the result payload that tool_update_fsm serializes."""
     kwargs = kwargs or {}
 
     # Initial state capture
     state_before = user.get_current_state()
     fsm_snapshot_before = user.get_fsm_snapshot()
+    # Resolve the INFO level once so disabled logging skips building the log arguments
+    log_info = verbose and fsm_logger.isEnabledFor(logging.INFO)
 
-    if verbose:
+    if log_info:
         fsm_logger.info("=== FSM UPDATE ATTEMPT ===")
-        fsm_logger.info(f"User ID: {getattr(user, 'phone_number', 'unknown')}")
-        fsm_logger.info(f"Current state: {state_before}")
-        fsm_logger.info(f"Requested event: {event_name}")
-        fsm_logger.info(f"Event kwargs: {kwargs}")
+        fsm_logger.info("User ID: %s", getattr(user, 'phone_number', 'unknown'))
+        fsm_logger.info("Current state: %s", state_before)
+        fsm_logger.info("Requested event: %s", event_name)
+        fsm_logger.info("Event kwargs: %s", kwargs)
 
     # Event coercion
     event_to_fire, coercion_reason = _coerce_event(state_before, event_name)
-    if verbose:
+    if log_info:
         if coercion_reason:
-            fsm_logger.info(f"Event coerced: {event_name} -> {event_to_fire} (reason: {coercion_reason})")
+            fsm_logger.info("Event coerced: %s -> %s (reason: %s)", event_name, event_to_fire, coercion_reason)
         else:
-            fsm_logger.info(f"No coercion needed: {event_name}")
+            fsm_logger.info("No coercion needed: %s", event_name)
 
     # Check allowed triggers
     allowed = _get_allowed_triggers(state_before, user, verbose=verbose)
-    if verbose:
-        fsm_logger.info(f"Allowed triggers from {state_before}: {sorted(allowed) if allowed else 'None'}")
+    allowed_sorted = _sorted_triggers(allowed)
+    if log_info:
+        fsm_logger.info("Allowed triggers from %s: %s", state_before, allowed_sorted or 'None')
 
     # Validate trigger
     if allowed and event_to_fire not in allowed:
@@ -87,7 +159,7 @@ def tool_update_fsm(user, event_name: str, kwargs=None, verbose: bool = True):
             fsm_logger.warning(
                 "REJECTED: %s not in allowed triggers %s",
                 event_to_fire,
-                sorted(allowed),
+                allowed_sorted,
             )
         result = {
             "applied": False,
@@ -97,20 +169,18 @@ def tool_update_fsm(user, event_name: str, kwargs=None, verbose: bool = True):
             "event_fired": None,
             "state_before": state_before,
             "state_after": state_before,  # stays the same
-            "allowed_triggers": sorted(allowed),
+            "allowed_triggers": allowed_sorted,
             "fsm": fsm_snapshot_before,
         }
-        if verbose:
-            fsm_logger.info(f"Returning rejection result: {result}")
-        return json.dumps(result)
+        if log_info:
+            fsm_logger.info("Returning rejection result: %s", result)
+        return result
 
     # Attempt the transition
     try:
-        if verbose:
+        if log_info:
             fsm_logger.info("Attempting to fire event: %s with kwargs: %s", event_to_fire, kwargs)
 
-        pre_transition_snapshot = user.get_fsm_snapshot()
-
         # Fire the event
         user.trigger_event(event_to_fire, verbose=verbose, **kwargs)
 
@@ -118,19 +188,19 @@ def tool_update_fsm(user, event_name: str, kwargs=None, verbose: bool = True):
         post_transition_snapshot = user.get_fsm_snapshot()
         changed = (state_after != state_before)
 
-        if verbose:
-            fsm_logger.info(f"Event fired successfully: {event_to_fire}")
-            fsm_logger.info(f"State transition: {state_before} -> {state_after}")
-            fsm_logger.info(f"State actually changed: {changed}")
+        if log_info:
+            fsm_logger.info("Event fired successfully: %s", event_to_fire)
+            fsm_logger.info("State transition: %s -> %s", state_before, state_after)
+            fsm_logger.info("State actually changed: %s", changed)
             if changed:
                 fsm_logger.info("SUCCESSFUL TRANSITION")
-            else:
-                fsm_logger.warning("NO STATE CHANGE (possible self-transition or condition failure)")
+        if verbose and not changed:
+            fsm_logger.warning("NO STATE CHANGE (possible self-transition or condition failure)")
 
-        new_allowed = _get_allowed_triggers(state_after, user, verbose=verbose)
-        if verbose:
-            fsm_logger.info(f"New allowed triggers: {sorted(new_allowed) if new_allowed else 'None'}")
-            if pre_transition_snapshot != post_transition_snapshot:
+        new_allowed = _sorted_triggers(_get_allowed_triggers(state_after, user, verbose=verbose))
+        if log_info:
+            fsm_logger.info("New allowed triggers: %s", new_allowed or 'None')
+            if fsm_snapshot_before != post_transition_snapshot:
                 fsm_logger.info("FSM snapshot changed during transition")
             else:
                 fsm_logger.info("FSM snapshot unchanged")
@@ -141,205 +211,60 @@ def tool_update_fsm(user, event_name: str, kwargs=None, verbose: bool = True):
             "event": event_to_fire,
             "from_state": state_before,
             "to_state": state_after,
-            "allowed_triggers": sorted(new_allowed),
+            "allowed_triggers": new_allowed,
             "fsm": post_transition_snapshot,
         }
 
-        if verbose:
+        if log_info:
             fsm_logger.info("Returning success result: %s", result)
-        return json.dumps(result)
-
-    except MachineError as e:
-        if verbose:
-            fsm_logger.error("MACHINE ERROR during transition: %s", e)
-            fsm_logger.error("Event: %s, State: %s, Kwargs: %s", event_to_fire, state_before, kwargs)
-
-        result = {
-            "applied": False,
-            "reason": "machine_error",
-            "error": str(e),
-            "event": event_to_fire,
-            "from_state": state_before,
-            "to_state": state_before,
-            "allowed_triggers": sorted(allowed),
-            "fsm": fsm_snapshot_before,
-        }
-        if verbose:
-            fsm_logger.info("Returning error result: %s", result)
-        return json.dumps(result)
+        return result
 
     except Exception as e:
-        if verbose:
-            fsm_logger.error("UNEXPECTED ERROR during transition: %s", e)
-            fsm_logger.error("Exception type: %s", type(e).__name__)
-            fsm_logger.error("Event: %s, State: %s, Kwargs: %s", event_to_fire, state_before, kwargs)
-
-        result = {
-            "applied": False,
-            "reason": "unexpected_error",
-            "error": f"{type(e).__name__}: {str(e)}",
-            "event": event_to_fire,
-            "from_state": state_before,
-            "to_state": state_before,
-            "allowed_triggers": sorted(allowed),
-            "fsm": fsm_snapshot_before,
-        }
-        if verbose:
-            fsm_logger.info("Returning unexpected error result: %s", result)
-        return json.dumps(result)
+        # MachineError is an expected rejection from the FSM; anything else also gets a traceback
+        if isinstance(e, MachineError):
+            reason, error = "machine_error", str(e)
+            if verbose:
+                fsm_logger.error(
+                    "MACHINE ERROR during transition: %s. Event: %s, State: %s, Kwargs: %s",
+                    e, event_to_fire, state_before, kwargs,
+                )
+        else:
+            reason, error = "unexpected_error", f"{type(e).__name__}: {str(e)}"
+            if verbose:
+                fsm_logger.exception(
+                    "UNEXPECTED ERROR during transition. Event: %s, State: %s, Kwargs: %s",
+                    event_to_fire, state_before, kwargs,
+                )
+        return _failed_transition(
+            reason, error, event_to_fire, state_before, allowed_sorted, fsm_snapshot_before, log_info,
+        )
 
     finally:
-        if verbose:
+        if log_info:
             fsm_logger.info("=== FSM UPDATE COMPLETE ===\n")
 
 
-def _get_allowed_triggers_prod(state: str, user: UserContext, verbose: bool = False) -> set[str]:
-    try:
-        # Machine exposed by `transitions`
-        a = set(sorted(user.fsm.machine.get_triggers(user.get_current_state())))
-        b = set(user.fsm.machine.get_triggers(state))
-        if verbose:
-            fsm_logger.debug("Allowed triggers for state %s: %s", state, b)
-            fsm_logger.debug("Allowed triggers after coercion: %s", a)
-        return set(a)
-        # return set(user.fsm.get_triggers(state))
-    except Exception as e:
-        if verbose:
-            fsm_logger.exception("Failed to determine allowed triggers for state %s", state)
-        return set()
-
-
-def _get_allowed_triggers(state: str, user: UserContext, verbose: bool = False) -> set[str]:
+def _get_allowed_triggers(state: str, user: UserContext, verbose: bool = False) -> frozenset[str]:
     """
     Get allowed triggers for a specific state using only explicitly defined triggers.
+    IntentionFlow precomputes its per-state trigger sets, so this is a lookup plus an intersection.
     """
-    def log(message: str, *args) -> None:
-        if verbose:
-            fsm_logger.debug(message, *args)
-
-    separator = "=" * 60
-    log("")
-    log(separator)
-    log("DEBUG: _get_allowed_triggers called (EXPLICIT TRIGGERS ONLY)")
-    log(separator)
-
-    # Define your explicit triggers from IntentionFlow class
-    EXPLICIT_TRIGGERS = {
-        'receive_positive_response',
-        'go_to_sqft',
-        'receive_followup',
-        'complete_flow',
-        'receive_negative_response',
-        'user_stopped',
-        'retry_confused',
-        'pause_flow',
-        'resume_flow',
-        'polite_ack'
-    }
-
     try:
-        # Input validation
-        log("INPUT PARAMETERS:")
-        log("   - Requested state: '%s' (type: %s)", state, type(state))
-        log("   - User object: %s (type: %s)", user, type(user))
-        log("   - Explicit triggers to check: %s", sorted(EXPLICIT_TRIGGERS))
-
-        # Check if user and fsm exist
-        if not hasattr(user, 'fsm'):
-            log("ERROR: User object has no 'fsm' attribute")
-            return set()
-
-        if not hasattr(user.fsm, 'machine'):
-            log("ERROR: FSM object has no 'machine' attribute")
-            return set()
-
-        log("User FSM structure looks valid")
-
-        # FSM introspection
-        log("")
-        log("FSM INTROSPECTION:")
-        fsm_machine = user.fsm.machine
-
-        # Get current state
-        try:
-            current_state = user.get_current_state()
-            log("   - Current state: '%s' (type: %s)", current_state, type(current_state))
-        except Exception as e:
-            log("   - ERROR getting current state: %s", e)
-            current_state = None
-
-        # Get all available states
-        try:
-            all_states = list(fsm_machine.states)
-            log("   - All available states (%s): %s", len(all_states), all_states)
-        except Exception as e:
-            log("   - ERROR getting all states: %s", e)
-            all_states = []
-
-        # Check if requested state exists
-        state_exists = state in [str(s) for s in all_states]
-        if state_exists:
-            log("   - Requested state '%s' found in available states", state)
-        else:
-            log("   - Requested state '%s' NOT found in available states", state)
-            # Check for similar states (case sensitivity, whitespace)
-            similar_states = [s for s in all_states if str(s).lower() == state.lower()]
-            if similar_states:
-                log("   - Similar states (case insensitive): %s", similar_states)
-
-        # Check which explicit triggers are valid from the requested state
-        log("")
-        log("EXPLICIT TRIGGER VALIDATION:")
-        valid_triggers = set()
-
-        for trigger in EXPLICIT_TRIGGERS:
-            try:
-                try:
-                    triggers_from_state = set(fsm_machine.get_triggers(state))
-                    is_valid = trigger in triggers_from_state
-                except Exception:
-                    # Fallback: check transitions manually
-                    is_valid = False
-                    for transition in fsm_machine.transitions:
-                        if (
-                            transition.trigger == trigger and
-                            (transition.source == state or
-                             transition.source == '*' or
-                             state in transition.source)
-                        ):
-                            is_valid = True
-                            break
-
-                if is_valid:
-                    valid_triggers.add(trigger)
-                    log("   - '%s' is valid from state '%s'", trigger, state)
-                else:
-                    log("   - '%s' is NOT valid from state '%s'", trigger, state)
-
-            except Exception as e:
-                log("   - Error checking trigger '%s': %s", trigger, e)
-
-        result = valid_triggers
-
-        # Final result
-        log("")
-        log("FINAL DECISION:")
-        log("   - Returning explicit triggers for state '%s': %s", state, sorted(result))
-        log("   - Filtered out auto-generated triggers like 'to_*'")
-        log("%s\n", separator)
-        return result
-
-    except Exception as e:
+        allowed = EXPLICIT_TRIGGERS.intersection(user.fsm.get_triggers(state))
+    except Exception:
         if verbose:
             fsm_logger.exception("UNEXPECTED ERROR in _get_allowed_triggers for state '%s'", state)
-        return set()
+        return frozenset()
 
+    if verbose and fsm_logger.isEnabledFor(logging.DEBUG):
+        fsm_logger.debug("Allowed triggers for state '%s': %s", state, sorted(allowed))
+    return allowed
 
 
 def tool_get_fsm_reply(user: UserContext):
     snap = user.get_fsm_snapshot()
     reply = user.reply_for_state(snap)
-    return json.dumps({"reply": reply, "fsm": snap})
+    return _dumps({"reply": reply, "fsm": snap})
 
 
 # Additional helper function for debugging
@@ -347,10 +272,8 @@ def debug_fsm_state(user, context=""):
     """Call this anywhere to get detailed FSM state info"""
     label = f" {context}" if context else ""
     fsm_logger.info("=== FSM STATE DEBUG%s ===", label)
-    fsm_logger.info("Current state: %s", user.get_current_state())
-    fsm_logger.info(
-        "Allowed triggers: %s",
-        sorted(_get_allowed_triggers(user.get_current_state(), user)),
-    )
+    state = user.get_current_state()
+    fsm_logger.info("Current state: %s", state)
+    fsm_logger.info("Allowed triggers: %s", sorted(_get_allowed_triggers(state, user)))
     fsm_logger.info("FSM snapshot: %s", user.get_fsm_snapshot())
     fsm_logger.info("=== END DEBUG ===")
@@ -4,7 +4,7 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional, Dict, Any
 
-from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Integer, Numeric, String, Text, text
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, Numeric, String, Text, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.associationproxy import association_proxy
@@ -41,6 +41,14 @@ class Contact(Base):
 
 class FSMState(Base):
     __tablename__ = "fsm_state"
+    # Partial index behind ReachOut's active-conversation COUNT; the predicate must match that query
+    __table_args__ = (
+        Index(
+            "ix_fsm_state_active",
+            "phone_number",
+            postgresql_where=text("statename NOT IN ('done', 'stop', 'pause')"),
+        ),
+    )
 
     phone_number: Mapped[str] = mapped_column(
         String(15), ForeignKey("phone.phone_number"), primary_key=True
@@ -67,6 +75,7 @@ class TestRun(Base):
 
 class TestCase(Base):
     __tablename__ = "test_case"
+    __table_args__ = (Index("ix_test_case_run_id", "run_id"),)
 
     case_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     run_id: Mapped[int] = mapped_column(ForeignKey("test_run.run_id"), nullable=False)
@@ -84,6 +93,7 @@ class TestCase(Base):
 
 class TwilioMessage(Base):
     __tablename__ = "twilio_message"
+    __table_args__ = (Index("ix_twilio_message_phone_sent_at", "phone_number", "sent_at"),)
 
     twilio_sid: Mapped[str] = mapped_column(String(64), primary_key=True)
     phone_number: Mapped[str] = mapped_column(
@@ -100,6 +110,12 @@ class TwilioMessage(Base):
 
 class Message(Base):
     __tablename__ = "message"
+    # Postgres does not index FK columns; these back the per-phone history queries in control_session
+    __table_args__ = (
+        Index("ix_message_phone_sent_at", "phone_number", "sent_at", "message_id"),
+        Index("ix_message_phone_message_id", "phone_number", "message_id"),
+        Index("ix_message_twilio_sid", "twilio_sid"),
+    )
 
     message_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     phone_number: Mapped[str] = mapped_column(
@@ -119,6 +135,7 @@ class Message(Base):
 
 class Usage(Base):
     __tablename__ = "usage"
+    __table_args__ = (Index("ix_usage_twilio_sid", "twilio_sid"),)
 
     usage_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     twilio_sid: Mapped[str] = mapped_column(
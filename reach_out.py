@@ -2,6 +2,9 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from typing import Any, Iterable, Mapping, MutableMapping, Optional, Sequence
 
@@ -11,6 +14,25 @@ from twilio_test import TwilioSMSClient
 from user_context import UserContext
 from models import FSMState, ReachOutRun
 from sqlalchemy import func, select
+from sqlalchemy import inspect as sa_inspect
+from twilio.base.exceptions import TwilioRestException
+
+
+class _RowAttributes:
+    """Lazy mapping over an object row's public attributes, for str.format_map."""
+
+    __slots__ = ("_row",)
+
+    def __init__(self, row: Any) -> None:
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        if key.startswith("_"):
+            raise KeyError(key)
+        try:
+            return getattr(self._row, key)
+        except AttributeError:
+            raise KeyError(key) from None
 
 
 class ReachOut:
@@ -20,6 +42,18 @@ class ReachOut:
         "REACH_OUT_CONCURRENCY",
         "REACH_OUT_CONCURRENCY_MAX"
     )
+    # Row fields read by _build_user_context
+    _ROW_KEYS = (
+        "name", "first_name", "last_name",
+        "services", "previous_services",
+        "days_since_cancelled", "days_since",
+        "last_service", "primary_service",
+    )
+    # Run-log counters are committed every this many rows so a crashed run still shows its progress
+    _PROGRESS_EVERY = 100
+    # 429 back-off: spacing doubles up to this many seconds, then shrinks by this factor per successful send
+    _MAX_SEND_INTERVAL = 5.0
+    _BACKOFF_DECAY = 0.9
 
     def __init__(
         self,
@@ -27,11 +61,21 @@ class ReachOut:
         twilio_client: TwilioSMSClient,
         db_factory: type[DB] | None = None,
         max_active_conversations: int | None = None,
+        max_sends_per_second: float | None = None,
     ) -> None:
         self._gpt = gpt_client
         self._twilio = twilio_client
         self._db_factory = db_factory or DB
         self._max_active = max_active_conversations
+        if max_sends_per_second is None:
+            max_sends_per_second = self._load_send_rate_from_env()
+        # Minimum spacing between Twilio sends; 0 disables pacing
+        self._send_interval = 1.0 / max_sends_per_second if max_sends_per_second else 0.0
+        # Configured spacing that 429 back-off decays back to
+        self._base_send_interval = self._send_interval
+        self._next_send_at = 0.0
+        self._pace_lock = threading.Lock()
+        self._workers = self._load_workers_from_env()
 
     def send_bulk(
         self,
@@ -42,6 +86,9 @@ class ReachOut:
     ) -> dict[str, Any]:
         """Send an initial outbound SMS to each customer row, logging the run.
 
+        A phone that appears in more than one row is only sent to once; later rows are
+        reported as skipped with reason "duplicate phone".
+
         Args:
             rows: Iterable containing mappings or objects with a phone number.
             message_template: Optional format string applied per row. When provided,
@@ -50,7 +97,10 @@ class ReachOut:
             reset_context: Clear any prior GPT context for the phone before sending.
             max_active: Override for the concurrent conversation limit; `None` falls back
                 to the value passed at construction. Conversations in the `done` state
-                are excluded from the count.
+                are excluded from the count. The count is a running estimate re-read from
+                the DB when it reaches the limit and at every progress checkpoint, so
+                conversations activated elsewhere during a run can overshoot the limit by
+                at most what is admitted between two re-counts.
 
         Returns:
             Summary payload containing the run id, per-row results, and aggregate stats.
@@ -66,6 +116,26 @@ class ReachOut:
         outbound_enabled = self._outbound_enabled()
         run_db: DB | None = None
         run_log: ReachOutRun | None = None
+        message_db: DB | None = None
+        # (phone, opener, sent_at) for sends collected since the last flush
+        pending_messages: list[tuple[str, str, datetime]] = []
+
+        def flush_messages() -> None:
+            nonlocal message_db
+            if not pending_messages:
+                return
+            if message_db is None:
+                message_db = self._db_factory()
+            self._gpt.log_many_with_db_instance(message_db, pending_messages)
+            pending_messages.clear()
+
+        def record_progress() -> None:
+            run_log.requested = requested_count
+            run_log.processed = sent_count + skipped_count + throttled_count + error_count
+            run_log.sent = sent_count
+            run_log.skipped = skipped_count
+            run_log.throttled = throttled_count
+            run_log.errors = error_count
 
         try:
             run_db = self._db_factory()
@@ -86,108 +156,141 @@ class ReachOut:
             run_db.session.add(run_log)
             run_db.session.flush()
             run_id = run_log.run_id
-
-            for row in rows:
-                requested_count += 1
-
+            # Running estimate of active conversations; the DB is only re-counted when it says we are at the limit
+            active_count: int | None = None
+
+            # Rows are admitted (throttle, phone, toggle checks) serially on this thread; the per-row
+            # user lookup and Twilio POST run on the pool so their network waits overlap.
+            # Maps each submitted send to its (slot in results, phone).
+            in_flight: dict[Future, tuple[int, str]] = {}
+            # Enough queued work to keep every worker busy without buffering the whole run in the executor
+            max_in_flight = 2 * self._workers
+
+            next_checkpoint = self._PROGRESS_EVERY
+
+            def checkpoint() -> None:
+                """Commit the run-log counters each time another _PROGRESS_EVERY rows have finished."""
+                nonlocal next_checkpoint, active_count
+                processed = sent_count + skipped_count + throttled_count + error_count
+                if processed < next_checkpoint:
+                    return
+                next_checkpoint = (processed // self._PROGRESS_EVERY + 1) * self._PROGRESS_EVERY
+                # run_log stays attached and unexpired, so this is a single UPDATE
+                record_progress()
+                run_db.session.commit()
                 if limit is not None:
-                    active_count = self._count_active_conversations(run_db)
-                    if active_count >= limit:
-                        throttled_count += 1
+                    # Re-count so conversations activated by webhooks or other workers mid-run are seen;
+                    # in-flight sends may not have persisted their state yet, so they are added on top
+                    active_count = self._count_active_conversations(run_db) + len(in_flight)
+
+            def collect_in_flight(timeout: float | None = None, return_when: str = ALL_COMPLETED) -> None:
+                """Record finished sends; by default waits for all of them, timeout=0 only takes what is done."""
+                nonlocal sent_count, error_count
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, timeout=timeout, return_when=return_when)
+                for future in sorted(done, key=in_flight.__getitem__):
+                    slot, phone = in_flight.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as exc:
+                        # One broken row must not stop the rest of the batch from being recorded and logged
+                        outcome = {"run_id": run_id, "phone": phone, "status": "error", "error": str(exc)}
+                    results[slot] = outcome
+                    if outcome["status"] == "sent":
+                        sent_count += 1
+                        # Visible to a reply's GPT turn as soon as the send is known to have gone out
+                        self._gpt.add_to_context(phone, "assistant", outcome["message"])
+                        pending_messages.append((phone, outcome["message"], outcome["sent_at"]))
+                    else:
+                        error_count += 1
+                # One batched INSERT per pass keeps the message log close behind the sends
+                flush_messages()
+                checkpoint()
+
+            # Bound once: the admission loop is the only per-row code on this thread
+            extract_phone = self._extract_phone
+            send_one = self._send_one
+            # Phones already submitted this run; a repeat would race the first on UserContext setup
+            seen_phones: set[str] = set()
+
+            with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="reach-out") as pool:
+                submit = pool.submit
+                for row in rows:
+                    # Record sends as they finish so results and logging don't wait for the whole run
+                    collect_in_flight(timeout=0)
+                    # Skipped and throttled rows finish on this thread, so they can tip a checkpoint too
+                    checkpoint()
+                    requested_count += 1
+
+                    if limit is not None:
+                        if active_count is None or active_count >= limit:
+                            # In-flight sends must land before the DB count can see them
+                            collect_in_flight()
+                            active_count = self._count_active_conversations(run_db)
+                        if active_count >= limit:
+                            throttled_count += 1
+                            results.append(
+                                {
+                                    "run_id": run_id,
+                                    "row": row,
+                                    "status": "skipped",
+                                    "reason": "throttled",
+                                    "active_conversations": active_count,
+                                }
+                            )
+                            continue
+
+                    phone = extract_phone(row)
+                    if not phone:
+                        skipped_count += 1
                         results.append(
                             {
                                 "run_id": run_id,
                                 "row": row,
                                 "status": "skipped",
-                                "reason": "throttled",
-                                "active_conversations": active_count,
+                                "reason": "missing phone",
                             }
                         )
                         continue
 
-                phone = self._extract_phone(row)
-                if not phone:
-                    skipped_count += 1
-                    results.append(
-                        {
-                            "run_id": run_id,
-                            "row": row,
-                            "status": "skipped",
-                            "reason": "missing phone",
-                        }
-                    )
-                    continue
-
-                if not outbound_enabled:
-                    skipped_count += 1
-                    results.append(
-                        {
-                            "run_id": run_id,
-                            "phone": phone,
-                            "status": "skipped",
-                            "reason": "outbound disabled",
-                        }
-                    )
-                    continue
+                    if phone in seen_phones:
+                        skipped_count += 1
+                        results.append(
+                            {
+                                "run_id": run_id,
+                                "phone": phone,
+                                "status": "skipped",
+                                "reason": "duplicate phone",
+                            }
+                        )
+                        continue
 
-                try:
-                    user = self._build_user_context(phone, row)
-                except Exception as exc:
-                    error_count += 1
-                    results.append(
-                        {
-                            "run_id": run_id,
-                            "phone": phone,
-                            "status": "error",
-                            "error": str(exc),
-                        }
-                    )
-                    continue
-
-                if reset_context:
-                    self._gpt.set_context(phone, [])
-
-                body = self._resolve_message(user, row, message_template)
+                    if not outbound_enabled:
+                        skipped_count += 1
+                        results.append(
+                            {
+                                "run_id": run_id,
+                                "phone": phone,
+                                "status": "skipped",
+                                "reason": "outbound disabled",
+                            }
+                        )
+                        continue
 
-                try:
-                    # Ensure FSM state is persisted so throttling counts this conversation
-                    user.get_current_state()
-                except Exception:
-                    pass
+                    if active_count is not None:
+                        # Upper bound: the send may fail or the phone may already be active; a re-count corrects it
+                        active_count += 1
 
-                try:
-                    self._twilio.send_sms(to_phone=phone, message=body)
-                except Exception as exc:
-                    error_count += 1
-                    results.append(
-                        {
-                            "run_id": run_id,
-                            "phone": phone,
-                            "status": "error",
-                            "error": str(exc),
-                        }
-                    )
-                    continue
-
-                db_instance = self._db_factory()
-                try:
-                    self._gpt.insert_with_db_instance(db_instance, body, user)
-                finally:
-                    try:
-                        db_instance.close()
-                    except Exception:
-                        pass
+                    seen_phones.add(phone)
+                    in_flight[submit(send_one, run_id, phone, row, message_template, reset_context)] = (len(results), phone)
+                    results.append({})
+                    if len(in_flight) >= max_in_flight:
+                        collect_in_flight(return_when=FIRST_COMPLETED)
 
-                sent_count += 1
-                results.append(
-                    {
-                        "run_id": run_id,
-                        "phone": phone,
-                        "status": "sent",
-                        "message": body,
-                    }
-                )
+                collect_in_flight()
 
+            flush_messages()
             processed_count = sent_count + skipped_count + throttled_count + error_count
 
             summary = {
@@ -206,16 +309,20 @@ class ReachOut:
                 "results": results,
             }
         finally:
+            try:
+                # Rows sent before an unexpected error still get logged
+                flush_messages()
+            finally:
+                if message_db is not None:
+                    try:
+                        message_db.close()
+                    except Exception:
+                        pass
             if run_log is not None and run_db is not None:
                 try:
-                    run_log.requested = requested_count
-                    run_log.processed = sent_count + skipped_count + throttled_count + error_count
-                    run_log.sent = sent_count
-                    run_log.skipped = skipped_count
-                    run_log.throttled = throttled_count
-                    run_log.errors = error_count
+                    record_progress()
                     run_log.finished_at = datetime.now(timezone.utc)
-                    run_db.session.add(run_log)
+                    # run_log is still attached and unexpired (only flushed), so this commits one UPDATE
                     run_db.session.commit()
                 except Exception:
                     try:
@@ -233,27 +340,73 @@ class ReachOut:
                 except Exception:
                     pass
 
+    def _send_one(
+        self,
+        run_id: int | None,
+        phone: str,
+        row: Any,
+        message_template: Optional[str],
+        reset_context: bool,
+    ) -> dict[str, Any]:
+        """Build the user, send the opening SMS and return the row result; runs on the send pool."""
+        try:
+            user = self._build_user_context(phone, row)
+        except Exception as exc:
+            return {"run_id": run_id, "phone": phone, "status": "error", "error": str(exc)}
+
+        if reset_context:
+            self._gpt.set_context(phone, [])
+
+        body = self._resolve_message(user, row, message_template)
+
+        try:
+            # Ensure FSM state is persisted so throttling counts this conversation
+            user.get_current_state()
+        except Exception:
+            pass
+
+        try:
+            self._pace_send()
+            self._twilio.send_sms(to_phone=phone, message=body)
+            # Stamped here, not when the batch is logged, so the opener sorts before any reply to it
+            sent_at = datetime.now(timezone.utc)
+        except Exception as exc:
+            if isinstance(exc, TwilioRestException) and exc.status == 429 and self._send_interval:
+                # Twilio is rate limiting us: halve the send rate, within the back-off ceiling
+                with self._pace_lock:
+                    ceiling = max(self._MAX_SEND_INTERVAL, self._base_send_interval)
+                    self._send_interval = min(self._send_interval * 2, ceiling)
+            return {"run_id": run_id, "phone": phone, "status": "error", "error": str(exc)}
+
+        if self._send_interval > self._base_send_interval:
+            # Recover towards the configured rate once sends go through again
+            with self._pace_lock:
+                self._send_interval = max(self._send_interval * self._BACKOFF_DECAY, self._base_send_interval)
+
+        return {"run_id": run_id, "phone": phone, "status": "sent", "message": body, "sent_at": sent_at}
+
     def _build_user_context(self, phone: str, row: Any) -> UserContext:
         """Create or hydrate the UserContext for outreach sending."""
         user = UserContext(phone)
+        values = self._row_values(row)
 
-        name = self._value(row, "name")
-        first = self._value(row, "first_name")
-        last = self._value(row, "last_name")
+        name = values.get("name")
+        first = values.get("first_name")
+        last = values.get("last_name")
         if not name:
             parts = [p for p in [first, last] if p]
             name = " ".join(parts)
 
-        services = self._value(row, "services")
+        services = values.get("services")
         if services is None:
-            services = self._value(row, "previous_services")
+            services = values.get("previous_services")
         services_list = self._coerce_services(services)
 
-        days_since_cancelled = self._value(row, "days_since_cancelled")
+        days_since_cancelled = values.get("days_since_cancelled")
         if days_since_cancelled is None:
-            days_since_cancelled = self._value(row, "days_since")
+            days_since_cancelled = values.get("days_since")
 
-        last_service = self._value(row, "last_service") or self._value(row, "primary_service")
+        last_service = values.get("last_service") or values.get("primary_service")
 
         if name or services_list or days_since_cancelled is not None or last_service:
             user.set_user_info(
@@ -274,8 +427,9 @@ class ReachOut:
         if template:
             try:
                 if isinstance(row, Mapping):
-                    return template.format(**row)
-                return template.format(**self._to_mapping(row))
+                    return template.format_map(row)
+                # Only the fields the template names are read, instead of materializing dir(row)
+                return template.format_map(_RowAttributes(row))
             except Exception:
                 pass
 
@@ -292,6 +446,13 @@ class ReachOut:
                     return text
         return None
 
+    @classmethod
+    def _row_values(cls, row: Any) -> Mapping[str, Any]:
+        """Mapping view of the fields outreach reads, so object rows are probed once per row."""
+        if isinstance(row, Mapping):
+            return row
+        return {key: getattr(row, key, None) for key in cls._ROW_KEYS}
+
     @staticmethod
     def _value(row: Any, key: str) -> Any:
         if isinstance(row, Mapping):
@@ -304,13 +465,18 @@ class ReachOut:
     def _to_mapping(row: Any) -> MutableMapping[str, Any]:
         if isinstance(row, Mapping):
             return dict(row)
+        state = sa_inspect(row, raiseerr=False)
+        if state is not None and hasattr(state, "mapper"):
+            # ORM rows: mapped columns only, so relationship loaders never fire a lazy SELECT
+            return {attr.key: getattr(row, attr.key) for attr in state.mapper.column_attrs}
         attrs = {k: getattr(row, k) for k in dir(row) if not k.startswith("_")}
         return attrs
 
     @staticmethod
     def _count_active_conversations(state_db: DB) -> int:
         session = state_db.session
-        stmt = select(func.count()).select_from(FSMState).where(func.coalesce(FSMState.statename, '').notin_(['done', 'stop', 'pause']))
+        # statename is NOT NULL, so the bare predicate is equivalent and matches the ix_fsm_state_active partial index
+        stmt = select(func.count()).select_from(FSMState).where(FSMState.statename.notin_(['done', 'stop', 'pause']))
         result = session.execute(stmt).scalar_one()
         return int(result or 0)
 
@@ -319,9 +485,9 @@ class ReachOut:
         if value is None:
             return []
         if isinstance(value, str):
-            return [item.strip() for item in value.split(",") if item.strip()]
+            return [item for item in (part.strip() for part in value.split(",")) if item]
         if isinstance(value, Sequence):
-            return [str(item).strip() for item in value if str(item).strip()]
+            return [text for text in (str(item).strip() for item in value) if text]
         return [str(value).strip()]
 
     @staticmethod
@@ -359,6 +525,38 @@ class ReachOut:
             return parsed
         return None
 
+    @staticmethod
+    def _load_send_rate_from_env() -> float | None:
+        raw_value = os.getenv("REACH_OUT_MPS")
+        if not raw_value:
+            return None
+        try:
+            parsed = float(raw_value)
+        except (TypeError, ValueError):
+            return None
+        return parsed if parsed > 0 else None
+
+    @staticmethod
+    def _load_workers_from_env() -> int:
+        try:
+            parsed = int(os.getenv("REACH_OUT_WORKERS", "4"))
+        except (TypeError, ValueError):
+            return 4
+        return max(parsed, 1)
+
+    def _pace_send(self) -> None:
+        """Sleep just long enough to keep sends under the configured messages-per-second."""
+        if not self._send_interval:
+            return
+        # Reserve the next slot under the lock, then sleep outside it so other workers can queue behind us
+        with self._pace_lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_send_at)
+            self._next_send_at = send_at + self._send_interval
+        wait = send_at - now
+        if wait > 0:
+            time.sleep(wait)
+
     @staticmethod
     def _apply_ceiling(limit: int, ceiling: int | None) -> int:
         if ceiling is None:
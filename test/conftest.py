@@ -0,0 +1,15 @@
+import pytest
+
+
+def pytest_configure(config):
+    # Fast local loop: pytest -m "not kdf"
+    config.addinivalue_line("markers", "kdf: exercises the admin password hasher")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _openai_env():
+    # Every GPTClient built in tests sees a fake key and no org from the developer's shell
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("OPENAI_API_KEY", "sk-test")
+        mp.delenv("OPENAI_ORG", raising=False)
+        yield
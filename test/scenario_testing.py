@@ -3,12 +3,13 @@
 
 from __future__ import annotations
 
+import functools
 import os
 import sys
 import time
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, List, Optional, Sequence, Tuple
 
 # Ensure project root on sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -19,21 +20,32 @@ try:
     from db import (
         DB as DBConn,
         ensure_test_run_tables,
-        insert_test_case,
+        insert_test_cases,
         insert_test_run,
         update_test_run,
     )
 except Exception:  # pragma: no cover - script fallback when deps missing
     DBConn = None
-    ensure_test_run_tables = insert_message_from_gpt = insert_test_case = insert_test_run = update_test_run = None
+    ensure_test_run_tables = insert_test_cases = insert_test_run = update_test_run = None
 
 DEFAULT_INTRO = "Hey! Quick check-in -- are you still seeing any pest activity?"
 
 
+def _print_sections(transcript: List[Tuple[str, str, str]], verbose: List[str]) -> None:
+    # Build the report once and emit it in a single write
+    lines = ["", "-- Transcript (clean) --"]
+    lines.extend(f"{role}: {text}\t[{state}]" for role, text, state in transcript)
+    lines.extend(["", "-- Details (verbose) --"])
+    lines.extend(verbose)
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
 @dataclass
 class TestConversationApp:
     app: ConversationApp
     intro_text: Optional[str]
+    # Harness-owned connection; the tester closes it once after the whole run
+    db: Optional[DBConn] = None
 
     @property
     def phone(self) -> str:
@@ -58,12 +70,11 @@ class TestConversationApp:
         self.app.reset_state()
         self.app.setup()
         intro = self.intro_text or self.app.intro_message or DEFAULT_INTRO
-        if insert_message_from_gpt and intro:
+        if self.db is not None and intro:
             try:
-                with self.db_factory() as db:
-                    db.insert_message_from_gpt(self.phone, intro)
+                self.db.insert_message_from_gpt(self.phone, intro)
             except Exception:
-                pass
+                self.db.session.rollback()
         self.intro_text = intro
 
     def cleanup(self) -> None:
@@ -71,6 +82,7 @@ class TestConversationApp:
             self.app.reset_state()
         except Exception:
             pass
+        self.app.close()
 
     def should_exit_stateful(self) -> bool:
         return self.app.should_exit_stateful()
@@ -87,6 +99,22 @@ class BotTester:
         self.cfg = load_config()
         if DBConn is None:
             raise RuntimeError("Database module unavailable; install dependencies before running scenarios.")
+        self._db: Optional[DBConn] = None
+
+    @property
+    def db(self) -> DBConn:
+        # One session for intros and run bookkeeping instead of one per scenario
+        if self._db is None:
+            self._db = DBConn()
+        return self._db
+
+    def close(self) -> None:
+        if self._db is not None:
+            try:
+                self._db.close()
+            except Exception:
+                pass
+            self._db = None
 
     def build_test_app(self, phone: Optional[str] = None) -> TestConversationApp:
         phone_number = phone or self.cfg["default_phone"]
@@ -99,15 +127,19 @@ class BotTester:
             db_factory=DBConn,  # type: ignore[arg-type]
             intro_message=self.cfg.get("intro_message") or DEFAULT_INTRO,
         )
-        harness = TestConversationApp(app=app, intro_text=self.cfg.get("intro_message") or DEFAULT_INTRO)
+        harness = TestConversationApp(
+            app=app,
+            intro_text=self.cfg.get("intro_message") or DEFAULT_INTRO,
+            db=self.db,
+        )
         harness.setup()
         return harness
 
     def test_scenario(
         self,
         name: str,
-        steps: List[Tuple[str, str]],
-        wait_time: float = 1.0,
+        steps: Sequence[Tuple[str, str]],
+        wait_time: float = 0.0,
     ) -> Tuple[bool, Optional[str], int]:
         print(f"\n[TEST] {name}")
         app = self.build_test_app()
@@ -122,12 +154,7 @@ class BotTester:
         transcript.append(("Bot", app.intro_text or DEFAULT_INTRO, initial_state))
 
         def print_sections() -> None:
-            print("\n-- Transcript (clean) --")
-            for role, text, state in transcript:
-                print(f"{role}: {text}\t[{state}]")
-            print("\n-- Details (verbose) --")
-            for line in verbose:
-                print(line)
+            _print_sections(transcript, verbose)
 
         try:
             for i, (user_input, expected_state) in enumerate(steps):
@@ -150,8 +177,11 @@ class BotTester:
                             ), steps_verified
                         break
 
+                    # handle_user_turn persists the FSM transition before returning; wait_time is only an
+                    # optional extra delay (e.g. to stay under API rate limits)
                     response = app.handle_user_turn(user_input)
-                    time.sleep(wait_time)
+                    if wait_time > 0:
+                        time.sleep(wait_time)
 
                     current_snapshot = app.user.get_fsm_snapshot()
                     current_state = app.user.get_current_state()
@@ -188,8 +218,10 @@ class BotTester:
         app: TestConversationApp,
         initial_wait: float,
         max_wait: float,
+        poll_interval: float = 0.05,
     ) -> str:
-        time.sleep(initial_wait)
+        if initial_wait > 0:
+            time.sleep(initial_wait)
         start_time = time.time()
         previous_state: Optional[str] = None
         stable_count = 0
@@ -203,16 +235,16 @@ class BotTester:
             else:
                 stable_count = 0
             previous_state = current_state
-            time.sleep(0.2)
+            time.sleep(poll_interval)
 
         return app.user.get_current_state()
 
     def test_scenario_with_adaptive_wait(
         self,
         name: str,
-        steps: List[Tuple[str, str]],
-        initial_wait: float = 0.75,
-        max_wait: float = 5.0,
+        steps: Sequence[Tuple[str, str]],
+        initial_wait: float = 0.0,
+        max_wait: float = 1.0,
     ) -> Tuple[bool, Optional[str], int]:
         print(f"\n[TEST] {name} (adaptive wait)")
         app = self.build_test_app()
@@ -227,12 +259,7 @@ class BotTester:
         transcript.append(("Bot", app.intro_text or DEFAULT_INTRO, initial_state))
 
         def print_sections() -> None:
-            print("\n-- Transcript (clean) --")
-            for role, text, state in transcript:
-                print(f"{role}: {text}\t[{state}]")
-            print("\n-- Details (verbose) --")
-            for line in verbose:
-                print(line)
+            _print_sections(transcript, verbose)
 
         try:
             for i, (user_input, expected_state) in enumerate(steps):
@@ -289,8 +316,8 @@ class BotTester:
 
     def run_tests(
         self,
-        scenarios: List[Tuple[str, List[Tuple[str, str]]]],
-        wait_time: float = 1.0,
+        scenarios: Sequence[Tuple[str, Sequence[Tuple[str, str]]]],
+        wait_time: float = 0.0,
         use_adaptive_wait: bool = False,
     ) -> bool:
         passed = failed = 0
@@ -298,15 +325,18 @@ class BotTester:
         print(f"[START] Running conversation flow tests with {wait_method} waiting...")
 
         results: List[dict] = []
+        # Case rows are written together with the run totals once every scenario has finished
+        pending_cases: List[dict] = []
         run_db = None
         run_id = None
         run_started = datetime.utcnow()
         if DBConn and ensure_test_run_tables and insert_test_run:
             try:
-                run_db = DBConn()
+                run_db = self.db
                 ensure_test_run_tables(run_db)
                 run_id = insert_test_run(run_db, started_at=run_started, total_passed=0, total_failed=0)
             except Exception:
+                self.db.session.rollback()
                 run_db = None
                 run_id = None
 
@@ -332,26 +362,25 @@ class BotTester:
                 }
             )
 
-            if run_db and run_id and insert_test_case:
-                try:
-                    insert_test_case(
-                        run_db,
-                        run_id=run_id,
-                        name=name,
-                        result=("PASS" if success else "FAIL"),
-                        steps_verified=steps_verified,
-                        total_steps=total_steps,
-                        duration_seconds=None,
-                        finished_at=datetime.utcnow(),
-                    )
-                except Exception:
-                    pass
+            pending_cases.append(
+                {
+                    "run_id": run_id,
+                    "name": name,
+                    "result": "PASS" if success else "FAIL",
+                    "steps_verified": steps_verified,
+                    "total_steps": total_steps,
+                    "duration_seconds": None,
+                    "finished_at": datetime.utcnow(),
+                }
+            )
 
         print(f"\n[RESULTS] {passed} passed, {failed} failed")
         self._print_results_table(results)
 
         if run_db and run_id and update_test_run:
             try:
+                if insert_test_cases:
+                    insert_test_cases(run_db, pending_cases, commit=False)
                 update_test_run(
                     run_db,
                     run_id=run_id,
@@ -361,11 +390,6 @@ class BotTester:
                 )
             except Exception:
                 pass
-            finally:
-                try:
-                    run_db.close()
-                except Exception:
-                    pass
 
         if failed == 0:
             print("[SUCCESS] All tests passed!")
@@ -382,16 +406,13 @@ class BotTester:
             return "| " + " | ".join(val.ljust(widths[idx]) for idx, val in enumerate(values)) + " |"
 
         sep = "+-" + "+-".join("-" * width for width in widths) + "-+"
-        print("\n" + sep)
-        print(fmt(headers))
-        print(sep)
-        for row in rows:
-            print(fmt(row))
-        print(sep + "\n")
+        table = [sep, fmt(headers), sep, *(fmt(row) for row in rows), sep]
+        sys.stdout.write("\n" + "\n".join(table) + "\n\n")
 
 
-def get_test_scenarios() -> List[Tuple[str, List[Tuple[str, str]]]]:
-    return [
+@functools.lru_cache(maxsize=1)
+def get_test_scenarios() -> Tuple[Tuple[str, Tuple[Tuple[str, str], ...]], ...]:
+    scenarios = [
         ("Happy path spray request", [
             ("yes id like a spray", "interested"),
             ("1300 just about", "follow_up"),
@@ -466,13 +487,17 @@ def get_test_scenarios() -> List[Tuple[str, List[Tuple[str, str]]]]:
             ("great appreciate it", "done"),
         ]),
     ]
+    # Tuples so the cached scenarios cannot be mutated between runs
+    return tuple((name, tuple(steps)) for name, steps in scenarios)
 
 
 def main() -> bool:
     tester = BotTester()
     scenarios = get_test_scenarios()
-    success = tester.run_tests(scenarios, use_adaptive_wait=True)
-    return success
+    try:
+        return tester.run_tests(scenarios, use_adaptive_wait=True)
+    finally:
+        tester.close()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 import pytest
-from fsm import IntentionFlow  # your FSM module
+from fsm import IntentionFlow, MachineError  # your FSM module
+
+MID_FLOW_STATES = ("start", "interested", "action_sqft", "confused", "follow_up", "pause")
 
 
 def test_initial_state():
@@ -26,30 +28,20 @@ def test_positive_path_to_done():
     assert flow.state == "done"
 
 
-def test_negative_response_from_anywhere():
-    states = [
-        "start", "interested", "action_sqft", "confused",
-        "follow_up", "pause"
-    ]
-
-    for state in states:
-        flow = IntentionFlow("user")
-        flow.state = state
-        flow.receive_negative_response()
-        assert flow.state == "not_interested"
-
+@pytest.mark.parametrize("state", MID_FLOW_STATES, ids=MID_FLOW_STATES)
+def test_negative_response_from_anywhere(state):
+    flow = IntentionFlow("user")
+    flow.state = state
+    flow.receive_negative_response()
+    assert flow.state == "not_interested"
 
-def test_user_stopped_from_anywhere():
-    states = [
-        "start", "interested", "action_sqft", "confused",
-        "pause", "follow_up"
-    ]
 
-    for state in states:
-        flow = IntentionFlow("user")
-        flow.state = state
-        flow.user_stopped()
-        assert flow.state == "stop"
+@pytest.mark.parametrize("state", MID_FLOW_STATES, ids=MID_FLOW_STATES)
+def test_user_stopped_from_anywhere(state):
+    flow = IntentionFlow("user")
+    flow.state = state
+    flow.user_stopped()
+    assert flow.state == "stop"
 
 
 def test_confused_retry_loop_and_pause():
@@ -78,7 +70,7 @@ def test_resume_flow_only_from_pause():
 
     # Should fail from other states (optional guard test)
     flow.state = "start"
-    with pytest.raises(Exception):
+    with pytest.raises(MachineError):
         flow.resume_flow()
 
 
@@ -104,10 +96,20 @@ def test_mark_interested_only_sets_flag_once():
 
 def test_invalid_transition_raises():
     flow = IntentionFlow("user")
-    # go_to_sqft isn't allowed from start
-    with pytest.raises(Exception):
-        flow.go_to_sqft()
+    # receive_followup isn't allowed from start (start -> go_to_sqft is, by design)
+    with pytest.raises(MachineError):
+        flow.receive_followup()
 
     # complete_flow isn't allowed from start
-    with pytest.raises(Exception):
+    with pytest.raises(MachineError):
         flow.complete_flow()
+
+
+def test_get_triggers_matches_transition_table():
+    assert IntentionFlow.get_triggers("follow_up") == {
+        "complete_flow", "polite_ack", "receive_negative_response", "retry_confused", "user_stopped",
+    }
+    # Unknown states only expose the wildcard triggers
+    assert IntentionFlow.get_triggers("legacy_state") == {
+        "receive_negative_response", "retry_confused", "user_stopped",
+    }
@@ -2,23 +2,33 @@ import pytest
 
 pytest.importorskip("flask_login")
 
+pytestmark = pytest.mark.kdf
+
+import admin as admin_module
 from admin import Admin
 
 
-def test_admin_hashes_plain_password():
-    admin = Admin("user", "secret")
+@pytest.fixture(scope="session")
+def fast_password_hash():
+    # Production KDF cost buys nothing here; one PBKDF2 round keeps hashing instant
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(admin_module, "_PASSWORD_HASH_METHOD", "pbkdf2:sha256:1")
+        yield
 
-    assert admin.password_hash is not None
-    assert admin.password_hash != "secret"
-    assert admin.check_password("secret")
-    assert not admin.check_password("other")
 
+@pytest.fixture(scope="session")
+def hashed_secret(fast_password_hash):
+    # Hash once per session; only the string is shared, never an Admin instance
+    return Admin("user", "secret").password_hash
 
-def test_admin_accepts_prehashed_password():
-    admin = Admin("user", "secret")
-    hashed = admin.password_hash
 
-    cloned = Admin("user", hashed)
+@pytest.mark.parametrize("use_prehashed", [False, True], ids=["plain_password", "prehashed_password"])
+def test_admin_password_roundtrip(use_prehashed, hashed_secret, fast_password_hash):
+    admin = Admin("user", hashed_secret if use_prehashed else "secret")
 
-    assert cloned.password_hash == hashed
-    assert cloned.check_password("secret")
+    assert admin.password_hash is not None
+    assert admin.password_hash != "secret"
+    if use_prehashed:
+        assert admin.password_hash == hashed_secret
+    assert admin.check_password("secret")
+    assert not admin.check_password("other")
@@ -1,18 +1,32 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, Mock
 
 import db
 from db import DB
 from models import Message, Phone
 
 
+class _FakeSession:
+    """Only the Session methods DB touches, as plain Mocks (cheaper than an auto-attribute MagicMock)."""
+
+    def __init__(self):
+        self.add = Mock()
+        self.commit = Mock()
+        self.flush = Mock()
+        self.rollback = Mock()
+        self.close = Mock()
+        self.execute = Mock()
+        self.get = Mock(return_value=None)
+        self.get_bind = Mock(return_value=None)
+
+
 @pytest.fixture
 def build_db(monkeypatch):
-    """Return a factory that yields (DB instance, mocked SQLAlchemy session)."""
-    sessions: list[MagicMock] = []
+    """Return a factory that yields (DB instance, fake SQLAlchemy session)."""
+    sessions: list[_FakeSession] = []
 
     def make_session():
-        session = MagicMock(name=f"session-{len(sessions) + 1}")
+        session = _FakeSession()
         sessions.append(session)
         return session
 
@@ -45,37 +59,34 @@ def test_context_manager_rolls_back_on_exception(build_db):
     session.close.assert_called_once()
 
 
-def test_quick_query_without_bind_skips_inspect(build_db, monkeypatch):
-    db_instance, session = build_db()
-    session.get_bind.return_value = None
-    inspect_mock = MagicMock()
-    monkeypatch.setattr(db, "inspect", inspect_mock)
-
-    db_instance.quick_query()
+class FakeInspector:
+    def get_schema_names(self):
+        return ["public", "pg_catalog"]
 
-    inspect_mock.assert_not_called()
+    def get_table_names(self, schema: str):
+        if schema == "public":
+            return ["message", "phone"]
+        return ["ignored"]
 
 
-def test_quick_query_with_bind_uses_inspect(build_db, monkeypatch):
+@pytest.mark.parametrize(
+    "bind, expected",
+    [(None, []), (object(), [("public", "message"), ("public", "phone")])],
+    ids=["without_bind_skips_inspect", "with_bind_uses_inspect"],
+)
+def test_quick_query(build_db, monkeypatch, bind, expected):
     db_instance, session = build_db()
-    fake_bind = object()
-    session.get_bind.return_value = fake_bind
-
-    class FakeInspector:
-        def get_schema_names(self):
-            return ["public", "pg_catalog"]
-
-        def get_table_names(self, schema: str):
-            if schema == "public":
-                return ["message", "phone"]
-            return ["ignored"]
-
+    session.get_bind.return_value = bind
     inspect_mock = MagicMock(return_value=FakeInspector())
     monkeypatch.setattr(db, "inspect", inspect_mock)
 
-    db_instance.quick_query()
+    tables = db_instance.quick_query()
 
-    inspect_mock.assert_called_once_with(fake_bind)
+    if bind is None:
+        inspect_mock.assert_not_called()
+    else:
+        inspect_mock.assert_called_once_with(bind)
+    assert tables == expected
 
 
 def test_insert_message_persists_inbound_payload(build_db, monkeypatch):
@@ -111,25 +122,86 @@ def test_insert_message_from_gpt_records_outbound(build_db):
     session.commit.assert_called_once()
 
 
-def test_ensure_phone_inserts_when_missing(build_db):
+def test_log_twilio_message_record_can_defer_commit(build_db, monkeypatch):
     db_instance, session = build_db()
-    session.get.return_value = None
+    monkeypatch.setattr(DB, "_ensure_phone", MagicMock())
+
+    db_instance.log_twilio_message_record("1112223333", "SM999", "outbound", "hi", commit=False)
+
+    assert session.add.call_args[0][0].twilio_sid == "SM999"
+    session.flush.assert_called_once()
+    session.commit.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "existing",
+    [None, Phone(phone_number="15558675309")],
+    ids=["inserts_when_missing", "returns_existing_without_inserting"],
+)
+def test_ensure_phone(build_db, existing):
+    db_instance, session = build_db()
+    session.get.return_value = existing
 
     phone = db_instance._ensure_phone("15558675309")
 
     assert isinstance(phone, Phone)
     assert phone.phone_number == "15558675309"
-    session.add.assert_called_once()
-    session.flush.assert_called_once()
+    if existing is None:
+        session.add.assert_called_once()
+        session.flush.assert_called_once()
+    else:
+        assert phone is existing
+        session.add.assert_not_called()
+        session.flush.assert_not_called()
+
+
+def test_resolve_pool_class_defaults_to_queue_pool(monkeypatch):
+    from sqlalchemy.pool import NullPool, QueuePool
+
+    for name in ("SQLALCHEMY_POOL_CLASS", "DB_POOL_CLASS", "SQLALCHEMY_POOL_ENABLED",
+                 "SQLALCHEMY_QUEUE_POOL", "DB_POOL_ENABLED", "PGBOUNCER_DSN"):
+        monkeypatch.delenv(name, raising=False)
+    assert db._resolve_pool_class() is QueuePool
+
+    monkeypatch.setenv("DB_POOL_ENABLED", "0")
+    assert db._resolve_pool_class() is NullPool
+    monkeypatch.delenv("DB_POOL_ENABLED")
+
+    monkeypatch.setenv("PGBOUNCER_DSN", "postgresql://bouncer/db")
+    assert db._resolve_pool_class() is NullPool
 
 
-def test_ensure_phone_returns_existing_without_inserting(build_db):
+def test_insert_test_cases_issues_one_insert(build_db):
     db_instance, session = build_db()
-    existing = Phone(phone_number="18005551212")
-    session.get.return_value = existing
+    cases = [
+        {"run_id": 1, "name": "a", "result": "PASS", "steps_verified": 2, "total_steps": 2},
+        {"run_id": 1, "name": "b", "result": "FAIL", "steps_verified": 0, "total_steps": 3},
+    ]
+
+    db.insert_test_cases(db_instance, cases, commit=False)
+
+    session.execute.assert_called_once()
+    assert session.execute.call_args[0][1] == cases
+    session.commit.assert_not_called()
+
+    session.execute.reset_mock()
+    db.insert_test_cases(db_instance, [])
+    session.execute.assert_not_called()
+
+
+def test_get_engine_configures_lifo_queue_pool(monkeypatch):
+    from sqlalchemy.pool import QueuePool
+
+    captured = {}
+    monkeypatch.setattr(db, "_engine", None)
+    monkeypatch.setattr(db, "_build_engine_url", lambda: "postgresql://user:pw@localhost/app")
+    monkeypatch.setattr(db, "_build_connect_args", lambda: {})
+    monkeypatch.setattr(db, "_resolve_pool_class", lambda: QueuePool)
+    monkeypatch.setattr(db, "create_engine", lambda url, **kwargs: captured.update(kwargs) or object())
+    monkeypatch.delenv("SQLALCHEMY_POOL_RECYCLE", raising=False)
 
-    phone = db_instance._ensure_phone("18005551212")
+    db.get_engine()
 
-    assert phone is existing
-    session.add.assert_not_called()
-    session.flush.assert_not_called()
+    assert captured["pool_use_lifo"] is True
+    assert captured["pool_recycle"] == 1800
+    assert captured["pool_pre_ping"] is True
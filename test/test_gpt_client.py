@@ -9,11 +9,7 @@ def _raise_runtime_error(*args, **kwargs):
     raise RuntimeError("boom")
 
 
-def test_chat_completion_wraps_errors(monkeypatch):
-    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
-    # Ensure optional values do not bleed in from developer machines
-    monkeypatch.delenv("OPENAI_ORG", raising=False)
-
+def test_chat_completion_wraps_errors():
     client = GPTClient()
     client._client = SimpleNamespace(
         chat=SimpleNamespace(
@@ -1,27 +1,33 @@
 import json
+from datetime import datetime, timezone
 from types import SimpleNamespace
+from typing import Callable, NamedTuple
 from unittest.mock import Mock
 import pytest
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 """
 Scenario coverage (quick table)
-Test                                                Model response 1                                Model response 2    Expected path
-test_happy_tool_short_circuit_on_get_fsm_reply      get_user_context, update_fsm, get_fsm_reply     —                   Short-circuit on get_fsm_reply, return template
-test_no_tool_calls_forces_template_reply            no tools                                        —                   Force tool_get_fsm_reply, return template
-test_unknown_tool_then_auto_second_turn             not_a_real_tool                                 no tools            Handle unknown tool, second call, then forced template
+Test / scenario case                                Model response 1                                Model response 2    Expected path
+happy_tool_short_circuit_on_get_fsm_reply           get_user_context, update_fsm, get_fsm_reply     —                   Short-circuit on get_fsm_reply, return template
+no_tool_calls_forces_template_reply                 no tools                                        —                   Force tool_get_fsm_reply, return template
+unknown_tool_then_auto_second_turn                  not_a_real_tool                                 no tools            Handle unknown tool, second call, then forced template
 test_context_appended_on_reply                      get_user_context, get_fsm_reply                 —                   Reply appended to _context, logged
-test_update_fsm_is_passed_kwargs_if_present         update_fsm with kwargs, get_fsm_reply           —                   kwargs flow into tool_update_fsm
+update_fsm_is_passed_kwargs_if_present              update_fsm with kwargs, get_fsm_reply           —                   kwargs flow into tool_update_fsm
+
+The plain scenarios run as cases of test_generate_response_scenarios.
 """
 """
-test_happy_tool_short_circuit_on_get_fsm_reply:
+happy_tool_short_circuit_on_get_fsm_reply:
 Scripts the first LLM turn to call get_user_context, update_fsm, and get_fsm_reply,
 testing the short-circuit path; success = returns TEMPLATE_REPLY, tools executed, reply logged/appended.
 
-test_no_tool_calls_forces_template_reply:
+no_tool_calls_forces_template_reply:
 Scripts the first LLM turn with no tool calls, testing the forced fallback to tool_get_fsm_reply; 
 success = returns TEMPLATE_REPLY and no other tools are invoked.
 
-test_unknown_tool_then_auto_second_turn:
+unknown_tool_then_auto_second_turn:
 Scripts an unknown tool on the first LLM turn and no tools on the second,
 testing resilience and the two-call loop; success = two client calls occur and final result is
 TEMPLATE_REPLY via tool_get_fsm_reply.
@@ -30,24 +36,29 @@ test_context_appended_on_reply:
 Scripts get_user_context then get_fsm_reply, testing that the assistant’s template reply is appended to _context and
 logged; success = _context ends with the template and DB log called.
 
-test_update_fsm_is_passed_kwargs_if_present:
+update_fsm_is_passed_kwargs_if_present:
 Scripts update_fsm with kwargs={"payload":123} followed by get_fsm_reply, testing argument plumbing to the tool;
 success = tool_update_fsm receives the kwargs payload and the method returns TEMPLATE_REPLY.
 """
 
 
 # ---------- helpers to mimic OpenAI chat response shape ----------
+_EMPTY_ARGS = "{}"
+
+
 def mk_tool_call(name, args=None, call_id="tool_1"):
-    return SimpleNamespace(
+    # Most scripted calls take no arguments; skip encoding for those
+    arguments = json.dumps(args) if args else _EMPTY_ARGS
+    return ChatCompletionMessageToolCall(
         id=call_id,
         type="function",
-        function=SimpleNamespace(name=name, arguments=json.dumps(args or {}))
+        function=Function(name=name, arguments=arguments)
     )
 
 
 def mk_message_with_tool_calls(tool_calls):
     # Mimic openai response: choices[0].message.tool_calls
-    msg = SimpleNamespace(tool_calls=tool_calls, content=None)
+    msg = ChatCompletionMessage(role="assistant", tool_calls=tool_calls, content=None)
     choice = SimpleNamespace(message=msg)
     return SimpleNamespace(choices=[choice])
 
@@ -68,51 +79,96 @@ class FakeDB:
     pass
 
 
-@pytest.fixture
-def fake_dependencies(monkeypatch):
-    # --- stub env key(s) used elsewhere ---
-    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
-
-    # --- stub tool loader so we don't import TOOLS constant anywhere ---
-    test_tools = [
-        {"type": "function",
-         "function": {"name": "get_user_context", "parameters": {"type": "object", "properties": {}}}},
-        {"type": "function", "function": {"name": "update_fsm", "parameters": {
-            "type": "object",
-            "properties": {"event_name": {"type": "string"}, "kwargs": {"type": "object"}},
-            "required": ["event_name"]
-        }}},
-        {"type": "function", "function": {"name": "get_fsm_reply", "parameters": {"type": "object", "properties": {}}}},
-    ]
+# --- stub tool schema, swapped in for gpt._TOOLS so tests don't depend on the tools file ---
+_TEST_TOOLS = (
+    {"type": "function",
+     "function": {"name": "get_user_context", "parameters": {"type": "object", "properties": {}}}},
+    {"type": "function", "function": {"name": "update_fsm", "parameters": {
+        "type": "object",
+        "properties": {"event_name": {"type": "string"}, "kwargs": {"type": "object"}},
+        "required": ["event_name"]
+    }}},
+    {"type": "function", "function": {"name": "get_fsm_reply", "parameters": {"type": "object", "properties": {}}}},
+)
+
+# Default return values for the gpt-module stubs, restored before every test
+_STUB_RETURNS = {
+    "get_session": [],
+    "tool_get_user_context": json.dumps({"ok": True}),
+    "tool_update_fsm": json.dumps({"fsm": {"state": "whatever"}}),
+    "tool_get_fsm_reply": json.dumps({"reply": "TEMPLATE_REPLY"}),
+}
+
+
+class _Recorder:
+    """Minimal stand-in for a stub function: records (args, kwargs) and returns a fixed result."""
+
+    def __init__(self, result=None):
+        self.result = result
+        self.calls = []
 
-    import gpt as gpt_module
-    monkeypatch.setattr(gpt_module, "load_tools", lambda: test_tools, raising=True)
-
-    # stubs your GPTClient calls
-    get_session = Mock(return_value=[])
-    tool_get_user_context = Mock(return_value=json.dumps({"ok": True}))
-    tool_update_fsm = Mock(return_value=json.dumps({"fsm": {"state": "whatever"}}))
-    tool_get_fsm_reply = Mock(return_value=json.dumps({"reply": "TEMPLATE_REPLY"}))
-    log_message_to_db = Mock()
-
-    # patch where referenced (gpt module namespace)
-    monkeypatch.setattr(gpt_module, "get_session_messages_no_base_prompt", get_session, raising=True)
-    monkeypatch.setattr(gpt_module, "tool_get_user_context", tool_get_user_context, raising=True)
-    monkeypatch.setattr(gpt_module, "tool_update_fsm", tool_update_fsm, raising=True)
-    monkeypatch.setattr(gpt_module, "tool_get_fsm_reply", tool_get_fsm_reply, raising=True)
-    monkeypatch.setattr(gpt_module, "log_message_to_db", log_message_to_db, raising=True)
-
-    return SimpleNamespace(
-        gpt_module=gpt_module,
-        get_session=get_session,
-        tool_get_user_context=tool_get_user_context,
-        tool_update_fsm=tool_update_fsm,
-        tool_get_fsm_reply=tool_get_fsm_reply,
-        log_message_to_db=log_message_to_db,
-    )
+    def __call__(self, *args, **kwargs):
+        self.calls.append((args, kwargs))
+        return self.result
+
+    def reset(self, result=None):
+        self.result = result
+        self.calls.clear()
+
+
+@pytest.fixture(scope="module")
+def _gpt_patches():
+    # Patched once per module; fake_dependencies resets the mocks between tests
+    with pytest.MonkeyPatch.context() as mp:
+        import gpt as gpt_module
+        # GPTClient copies the module-level schema loaded at import time
+        mp.setattr(gpt_module, "_TOOLS", _TEST_TOOLS, raising=True)
+
+        # stubs your GPTClient calls
+        deps = SimpleNamespace(
+            gpt_module=gpt_module,
+            get_session=_Recorder(),
+            tool_get_user_context=_Recorder(),
+            tool_update_fsm=_Recorder(),
+            tool_get_fsm_reply=_Recorder(),
+            log_message_to_db=_Recorder(),
+        )
+
+        # patch where referenced (gpt module namespace)
+        mp.setattr(gpt_module, "get_session_messages_no_base_prompt", deps.get_session, raising=True)
+        mp.setattr(gpt_module, "tool_get_user_context", deps.tool_get_user_context, raising=True)
+        mp.setattr(gpt_module, "tool_update_fsm", deps.tool_update_fsm, raising=True)
+        mp.setattr(gpt_module, "tool_get_fsm_reply", deps.tool_get_fsm_reply, raising=True)
+        mp.setattr(gpt_module, "log_message_to_db", deps.log_message_to_db, raising=True)
+        yield deps
+
+
+@pytest.fixture
+def fake_dependencies(_gpt_patches):
+    _gpt_patches.log_message_to_db.reset()
+    for name, value in _STUB_RETURNS.items():
+        getattr(_gpt_patches, name).reset(value)
+    return _gpt_patches
 
 
 # ---------- client scriptor ----------
+class _Completions:
+    def __init__(self, outer):
+        self.outer = outer
+
+    def create(self, **kwargs):
+        outer = self.outer
+        outer.calls.append(kwargs)
+        if not outer._responses:
+            raise AssertionError("Ran out of scripted responses")
+        return outer._responses.pop(0)
+
+
+class _Chat:
+    def __init__(self, outer):
+        self.completions = _Completions(outer)
+
+
 class ScriptedClient:
     """
     Fake OpenAI client that returns a sequence of pre-baked responses
@@ -122,102 +178,96 @@ class ScriptedClient:
     def __init__(self, responses):
         self._responses = list(responses)
         self.calls = []
-
-        class _Chat:
-            def __init__(self, outer):
-                self.outer = outer
-
-                class _Completions:
-                    def __init__(self, outer):
-                        self.outer = outer
-
-                    def create(_self, **kwargs):
-                        outer.calls.append(kwargs)
-                        if not outer._responses:
-                            raise AssertionError("Ran out of scripted responses")
-                        return outer._responses.pop(0)
-
-                self.completions = _Completions(self)
-
         self.chat = _Chat(self)
 
 
 # ---------- tests ----------
-def test_happy_tool_short_circuit_on_get_fsm_reply(fake_dependencies, monkeypatch):
-    # First LLM turn: asks for get_user_context and update_fsm and get_fsm_reply together
-    first = mk_message_with_tool_calls([
-        mk_tool_call("get_user_context", {}, "tc1"),
-        mk_tool_call("update_fsm", {"event_name": "go_to_sqft"}, "tc2"),
-        mk_tool_call("get_fsm_reply", {}, "tc3"),  # Should SHORT-CIRCUIT and return immediately
-    ])
-
-    client = ScriptedClient([first])
-
-    # Build GPTClient with our fake client
-    GPTClient = fake_dependencies.gpt_module.GPTClient
-    gpt = GPTClient()
-    gpt._client = client  # inject
-
-    user = FakeUser()
-    db = FakeDB()
-
-    out = gpt.generate_response("user says hi", user, db)
-    assert out == "TEMPLATE_REPLY"
-
+def _assert_short_circuit(client, deps):
+    # The stub schema, not the tools file, is what reaches the API
+    assert client.calls[0]["tools"] == _TEST_TOOLS
     # tool execution order
-    assert fake_dependencies.tool_get_user_context.called
-    assert fake_dependencies.tool_update_fsm.called
-    assert fake_dependencies.tool_get_fsm_reply.called
+    assert deps.tool_get_user_context.calls
+    assert deps.tool_update_fsm.calls
+    assert deps.tool_get_fsm_reply.calls
     # generate_response no longer logs automatically
-    fake_dependencies.log_message_to_db.assert_not_called()
-
+    assert not deps.log_message_to_db.calls
 
-def test_no_tool_calls_forces_template_reply(fake_dependencies, monkeypatch):
-    # First LLM turn: no tools → code forces tool_get_fsm_reply
-    first = mk_message_no_tools()
-    client = ScriptedClient([first])
 
-    GPTClient = fake_dependencies.gpt_module.GPTClient
-    gpt = GPTClient()
-    gpt._client = client
+def _assert_forced_template(client, deps):
+    # Should NOT call other tools
+    assert not deps.tool_get_user_context.calls
+    assert not deps.tool_update_fsm.calls
+    assert len(deps.tool_get_fsm_reply.calls) == 1
 
-    user = FakeUser()
-    db = FakeDB()
 
-    out = gpt.generate_response("anything", user, db)
-    assert out == "TEMPLATE_REPLY"
+def _assert_second_turn(client, deps):
+    # (we can't assert internal messages, but we can assert the second call happened)
+    assert len(client.calls) == 2
+    assert len(deps.tool_get_fsm_reply.calls) == 1
 
-    # Should NOT call other tools
-    fake_dependencies.tool_get_user_context.assert_not_called()
-    fake_dependencies.tool_update_fsm.assert_not_called()
-    fake_dependencies.tool_get_fsm_reply.assert_called_once()
 
+def _assert_update_fsm_kwargs(client, deps):
+    assert len(deps.tool_update_fsm.calls) == 1
+    _, kwargs = deps.tool_update_fsm.calls[-1]
+    # calls hold (args, kwargs); kwargs should include the parsed 'kwargs'
+    assert kwargs["kwargs"] == {"payload": 123}
 
-def test_unknown_tool_then_auto_second_turn(fake_dependencies, monkeypatch):
-    # First LLM turn: returns an unknown tool + a known one
-    first = mk_message_with_tool_calls([
-        mk_tool_call("not_a_real_tool", {"x": 1}, "t1"),
-    ])
-    # After we handle tools, code does a second LLM call (tool_choice="auto")
-    # Make that second call return *no tools*, so we fall back to template reply
-    second = mk_message_no_tools()
 
-    client = ScriptedClient([first, second])
+class Case(NamedTuple):
+    name: str
+    user_input: str
+    # Called per case so each test gets fresh scripted responses
+    responses: Callable[[], list]
+    check: Callable[..., None]
+
+
+CASES = [
+    Case(
+        "happy_tool_short_circuit_on_get_fsm_reply",
+        "user says hi",
+        lambda: [mk_message_with_tool_calls([
+            mk_tool_call("get_user_context", {}, "tc1"),
+            mk_tool_call("update_fsm", {"event_name": "go_to_sqft"}, "tc2"),
+            mk_tool_call("get_fsm_reply", {}, "tc3"),  # Should SHORT-CIRCUIT and return immediately
+        ])],
+        _assert_short_circuit,
+    ),
+    # No tools -> code forces tool_get_fsm_reply
+    Case("no_tool_calls_forces_template_reply", "anything", lambda: [mk_message_no_tools()], _assert_forced_template),
+    Case(
+        "unknown_tool_then_auto_second_turn",
+        "go!",
+        # The second call (tool_choice="auto") returns no tools, so we fall back to the template reply
+        lambda: [
+            mk_message_with_tool_calls([mk_tool_call("not_a_real_tool", {"x": 1}, "t1")]),
+            mk_message_no_tools(),
+        ],
+        _assert_second_turn,
+    ),
+    Case(
+        "update_fsm_is_passed_kwargs_if_present",
+        "run",
+        lambda: [mk_message_with_tool_calls([
+            mk_tool_call("update_fsm", {"event_name": "receive_followup", "kwargs": {"payload": 123}}, "tc1"),
+            mk_tool_call("get_fsm_reply", {}, "tc2"),
+        ])],
+        _assert_update_fsm_kwargs,
+    ),
+]
+
+
+@pytest.mark.parametrize("case", CASES, ids=lambda c: c.name)
+def test_generate_response_scenarios(case, fake_dependencies):
+    client = ScriptedClient(case.responses())
 
     GPTClient = fake_dependencies.gpt_module.GPTClient
     gpt = GPTClient()
-    gpt._client = client
-
-    user = FakeUser()
-    db = FakeDB()
+    gpt._client = client  # inject
 
-    out = gpt.generate_response("go!", user, db)
+    out = gpt.generate_response(case.user_input, FakeUser(), FakeDB())
     assert out == "TEMPLATE_REPLY"
 
-    # Unknown tool path hit
-    # (we can’t assert internal messages, but we can assert the second call happened)
-    assert len(client.calls) == 2
-    fake_dependencies.tool_get_fsm_reply.assert_called_once()
+    case.check(client, fake_dependencies)
 
 
 def test_context_appended_on_reply(fake_dependencies, monkeypatch):
@@ -244,31 +294,46 @@ def test_context_appended_on_reply(fake_dependencies, monkeypatch):
 
     convo = gpt.get_context(user.phone_number)
     assert convo[-1] == {"role": "assistant", "content": "TEMPLATE_REPLY"}
-    fake_dependencies.log_message_to_db.assert_called_once_with(
-        db, user.phone_number, "TEMPLATE_REPLY", twilio_sid="SM123"
-    )
+    assert fake_dependencies.log_message_to_db.calls == [
+        ((db, user.phone_number, "TEMPLATE_REPLY"), {"twilio_sid": "SM123"})
+    ]
 
 
-def test_update_fsm_is_passed_kwargs_if_present(fake_dependencies, monkeypatch):
-    # Make the model ask update_fsm with kwargs
-    first = mk_message_with_tool_calls([
-        mk_tool_call("update_fsm", {"event_name": "receive_followup", "kwargs": {"payload": 123}}, "tc1"),
-        mk_tool_call("get_fsm_reply", {}, "tc2"),
-    ])
-    client = ScriptedClient([first])
+def test_log_many_logs_once_without_touching_context(fake_dependencies, monkeypatch):
+    log_messages_to_db = Mock()
+    monkeypatch.setattr(fake_dependencies.gpt_module, "log_messages_to_db", log_messages_to_db, raising=True)
+
+    gpt = fake_dependencies.gpt_module.GPTClient()
+    db = FakeDB()
+    sent_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    replies = [("111", "hi A", sent_at), ("222", "hi B", sent_at)]
+
+    gpt.log_many_with_db_instance(db, replies)
+
+    assert gpt.get_context("111") == []
+    log_messages_to_db.assert_called_once_with(db, replies)
+
+
+def test_db_history_follows_system_prompt_without_memory_duplicates(fake_dependencies, monkeypatch):
+    # History comes back newest-first, like get_session_messages_no_base_prompt
+    fake_dependencies.get_session.result = [
+        {"role": "user", "content": "yes please"},
+        {"role": "assistant", "content": "Still seeing pests?"},
+    ]
+    client = ScriptedClient([mk_message_no_tools()])
 
     GPTClient = fake_dependencies.gpt_module.GPTClient
     gpt = GPTClient()
     gpt._client = client
 
     user = FakeUser()
-    db = FakeDB()
+    gpt.set_context(user.phone_number, [{"role": "assistant", "content": "Still seeing pests?"}])
 
-    out = gpt.generate_response("run", user, db)
-    assert out == "TEMPLATE_REPLY"
+    gpt.generate_response("yes please", user, FakeDB())
 
-    # Verify kwargs made it through
-    fake_dependencies.tool_update_fsm.assert_called_once()
-    _, kwargs = fake_dependencies.tool_update_fsm.call_args
-    # call_args = (args, kwargs); kwargs should include the parsed 'kwargs'
-    assert kwargs["kwargs"] == {"payload": 123}
+    sent = client.calls[0]["messages"]
+    assert sent[0] is gpt._system_message
+    assert sent[1:] == [
+        {"role": "assistant", "content": "Still seeing pests?"},
+        {"role": "user", "content": "yes please"},
+    ]
@@ -0,0 +1,30 @@
+from unittest.mock import Mock
+
+import main
+
+
+class FakeUser:
+    """Caches the state like UserContext does; only refresh=True re-reads the stored row."""
+
+    def __init__(self, store):
+        self.store = store
+        self.state = store["statename"]
+
+    def get_current_state(self, refresh: bool = False):
+        if refresh:
+            self.state = self.store["statename"]
+        return self.state
+
+
+def test_console_exits_on_external_state_write():
+    store = {"statename": "start"}
+    app = main.ConversationApp(phone="4802982000", gpt=Mock(), user=FakeUser(store))
+    try:
+        app.setup()
+        assert not app.should_exit_stateful()
+
+        # The webhook STOP path writes fsm_state directly
+        store["statename"] = "stop"
+        assert app.should_exit_stateful()
+    finally:
+        app.close()
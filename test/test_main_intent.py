@@ -1,9 +1,8 @@
 # test_fsm_tools_get_user_context.py
 import json
-from types import SimpleNamespace
 import pytest
 
-from main_intent import tool_get_user_context, _coerce_event, tool_update_fsm
+from main_intent import tool_get_user_context, _coerce_event, tool_update_fsm, _user_context_payload
 
 
 class FakeMachine:
@@ -21,7 +20,7 @@ class FakeUser:
         self.user_data = {"name": "Ryan"}
         self.twilio_data = {"sid": "SM123"}
         self._snap = {"state": state, "meta": {"k": 1}}
-        self.fsm = SimpleNamespace(machine=FakeMachine(triggers))
+        self.fsm = FakeMachine(triggers)
 
     def get_current_state(self):
         return self._state
@@ -30,8 +29,15 @@ class FakeUser:
         return self._snap
 
 
-def test_get_user_context_happy_path_sorted_triggers():
-    user = FakeUser(state="active", triggers=["b", "a", "c"])
+@pytest.fixture
+def make_user():
+    def _make(state, triggers, phone="4802982000"):
+        return FakeUser(state, triggers, phone)
+    return _make
+
+
+def test_get_user_context_happy_path_sorted_triggers(make_user):
+    user = make_user("active", ["b", "a", "c"])
     out = json.loads(tool_get_user_context(user))
     assert out["current_state"] == "active"
     assert out["phone_number"] == "4802982000"
@@ -42,9 +48,9 @@ def test_get_user_context_happy_path_sorted_triggers():
     assert out["allowed_triggers"] == ["a", "b", "c"]
 
 
-def test_get_user_context_follow_up_has_expected_hint():
-    user = FakeUser(state="follow_up", triggers=["retry_confused", "polite_ack"])
-    out = json.loads(tool_get_user_context(user))
+def test_get_user_context_follow_up_has_expected_hint(make_user):
+    user = make_user("follow_up", ["retry_confused", "polite_ack"])
+    out = _user_context_payload(user)
     # Exact hint text required by contract
     assert out["nlu_hint"] == (
         "If current_state is 'follow_up', map acknowledgements like 'ok/thanks/got it' "
@@ -52,8 +58,8 @@ def test_get_user_context_follow_up_has_expected_hint():
     )
 
 
-def test_get_user_context_handles_various_iterables_for_triggers():
-    # Triggers as a set (order-unstable) → function must still return a sorted list
-    user = FakeUser(state="active", triggers={"z", "m", "a"})
-    out = json.loads(tool_get_user_context(user))
-    assert out["allowed_triggers"] == ["a", "m", "z"]
+def test_get_user_context_handles_various_iterables_for_triggers(make_user):
+    # Triggers as a set (order-unstable) → payload must still carry them sorted
+    user = make_user("active", {"z", "m", "a"})
+    out = _user_context_payload(user)
+    assert out["allowed_triggers"] == ("a", "m", "z")
@@ -1,9 +1,8 @@
 import json
 import pytest
-from types import SimpleNamespace
-from transitions.core import MachineError
+from fsm import MachineError
 
-from main_intent import _coerce_event, tool_update_fsm
+from main_intent import _coerce_event, _update_fsm, tool_update_fsm
 
 
 # ---------- fakes ----------
@@ -18,8 +17,7 @@ class FakeMachine:
 class FakeUser:
     def __init__(self, state, triggers):
         self._state = state
-        self.machine = FakeMachine(triggers)
-        self.fsm = SimpleNamespace(machine=self.machine)
+        self.fsm = FakeMachine(triggers)
         self.phone_number = "4802982000"
         self.user_data = {}
         self.twilio_data = {}
@@ -48,7 +46,7 @@ def test_coerce_event_follow_up_maps_ack():
 # 2) tool_update_fsm should APPLY the *coerced* event (polite_ack) when allowed
 def test_tool_update_fsm_applies_coerced_event_when_allowed():
     user = FakeUser(state="follow_up", triggers={"polite_ack", "complete_flow"})
-    out = json.loads(tool_update_fsm(user, "retry_confused"))
+    out = _update_fsm(user, "retry_confused")
     # Expect success using the coerced event
     assert out["applied"] is True
     assert user._last_event == "polite_ack"
@@ -1,5 +1,7 @@
-import unittest
+from operator import attrgetter
+from types import SimpleNamespace
 
+import pytest
 from sqlalchemy import Float, Integer, Numeric, String
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -16,73 +18,97 @@ from models import (
 )
 
 
-class TestModelsMetadata(unittest.TestCase):
-    def test_tables_registered(self):
-        expected_tables = {
-            "phone",
-            "contact",
-            "fsm_state",
-            "test_run",
-            "test_case",
-            "twilio_message",
-            "message",
-            "usage",
-            "reach_out_run"
-        }
-        self.assertEqual(set(Base.metadata.tables.keys()), expected_tables)
-
-    def test_phone_columns(self):
-        phone_table = Phone.__table__
-        phone_number = phone_table.c.phone_number
-        self.assertTrue(phone_number.primary_key)
-        self.assertIsInstance(phone_number.type, String)
-        self.assertEqual(phone_number.type.length, 15)
-        self.assertEqual(len(phone_table.foreign_keys), 0)
-
-    def test_contact_foreign_key(self):
-        contact_table = Contact.__table__
-        phone_fk = list(contact_table.c.phone_number.foreign_keys)
-        self.assertEqual(len(phone_fk), 1)
-        self.assertEqual(phone_fk[0].column.table.name, "phone")
-        # self.assertEqual(contact_table.columns['customer_id'].type.__class__, Integer)
-
-    def test_message_columns_and_fks(self):
-        message_table = Message.__table__
-        phone_fk = list(message_table.c.phone_number.foreign_keys)
-        twilio_fk = list(message_table.c.twilio_sid.foreign_keys)
-        self.assertEqual(phone_fk[0].column.table.name, "phone")
-        self.assertEqual(twilio_fk[0].column.table.name, "twilio_message")
-        self.assertIsInstance(message_table.c.message_data.type, JSONB)
-
-    def test_numeric_and_float_columns(self):
-        usage_table = Usage.__table__
-        price_col = usage_table.c.price
-        self.assertIsInstance(price_col.type, Numeric)
-        self.assertEqual(price_col.type.precision, 6)
-        self.assertEqual(price_col.type.scale, 2)
-
-        test_case_table = TestCase.__table__
-        duration_col = test_case_table.c.duration_seconds
-        self.assertIsInstance(duration_col.type, Float)
-
-    def test_relationship_mappings(self):
-        self.assertIs(Phone.messages.property.mapper.class_, Message)
-        self.assertFalse(Phone.fsm_state.property.uselist)
-        self.assertIs(Message.phone.property.mapper.class_, Phone)
-        self.assertIs(TwilioMessage.messages.property.mapper.class_, Message)
-        self.assertIs(Usage.twilio_message.property.mapper.class_, TwilioMessage)
-
-    def test_testcase_foreign_key(self):
-        test_case_table = TestCase.__table__
-        run_fk = list(test_case_table.c.run_id.foreign_keys)
-        self.assertEqual(run_fk[0].column.table.name, "test_run")
-
-    def test_testrun_defaults(self):
-        test_run_table = TestRun.__table__
-        self.assertIsInstance(test_run_table.c.total_passed.type, Integer)
-        self.assertEqual(str(test_run_table.c.total_passed.server_default.arg), "0")
-        self.assertEqual(str(test_run_table.c.total_failed.server_default.arg), "0")
-
-
-if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+@pytest.fixture(scope="session")
+def meta():
+    # Metadata is static once models is imported, so snapshot it once for every test
+    return SimpleNamespace(
+        tables=set(Base.metadata.tables),
+        phone=Phone.__table__,
+        contact=Contact.__table__,
+        message=Message.__table__,
+        test_case=TestCase.__table__,
+        indexes={
+            model: {ix.name: [c.name for c in ix.columns] for ix in model.__table__.indexes}
+            for model in (Message, Usage, TestCase)
+        },
+    )
+
+
+def _fk_tables(column) -> list[str]:
+    return [fk.column.table.name for fk in column.foreign_keys]
+
+
+def test_tables_registered(meta):
+    expected_tables = {
+        "phone",
+        "contact",
+        "fsm_state",
+        "test_run",
+        "test_case",
+        "twilio_message",
+        "message",
+        "usage",
+        "reach_out_run"
+    }
+    assert meta.tables == expected_tables
+
+
+def test_phone_columns(meta):
+    phone_number = meta.phone.c.phone_number
+    assert phone_number.primary_key
+    assert isinstance(phone_number.type, String)
+    assert phone_number.type.length == 15
+    assert len(meta.phone.foreign_keys) == 0
+
+
+def test_contact_foreign_key(meta):
+    assert _fk_tables(meta.contact.c.phone_number) == ["phone"]
+
+
+def test_message_columns_and_fks(meta):
+    assert _fk_tables(meta.message.c.phone_number) == ["phone"]
+    assert _fk_tables(meta.message.c.twilio_sid) == ["twilio_message"]
+    assert isinstance(meta.message.c.message_data.type, JSONB)
+
+
+# (model, column, type class, {dotted attribute path on the column: expected value})
+COLUMN_CASES = [
+    (Usage, "price", Numeric, {"type.precision": 6, "type.scale": 2}),
+    (TestCase, "duration_seconds", Float, {}),
+    (TestRun, "total_passed", Integer, {"server_default.arg": "0"}),
+    (TestRun, "total_failed", Integer, {"server_default.arg": "0"}),
+]
+
+
+@pytest.mark.parametrize(
+    "model, column_name, type_cls, attrs",
+    COLUMN_CASES,
+    ids=[f"{model.__tablename__}.{column_name}" for model, column_name, _, _ in COLUMN_CASES],
+)
+def test_column_shape(model, column_name, type_cls, attrs):
+    column = model.__table__.c[column_name]
+    assert isinstance(column.type, type_cls)
+    for path, expected in attrs.items():
+        actual = attrgetter(path)(column)
+        # Server defaults are SQL text clauses; compare their rendered form
+        assert (str(actual) if isinstance(expected, str) else actual) == expected
+
+
+def test_relationship_mappings():
+    assert Phone.messages.property.mapper.class_ is Message
+    assert not Phone.fsm_state.property.uselist
+    assert Message.phone.property.mapper.class_ is Phone
+    assert TwilioMessage.messages.property.mapper.class_ is Message
+    assert Usage.twilio_message.property.mapper.class_ is TwilioMessage
+
+
+def test_testcase_foreign_key(meta):
+    assert _fk_tables(meta.test_case.c.run_id) == ["test_run"]
+
+
+def test_fk_lookup_columns_are_indexed(meta):
+    message_indexes = meta.indexes[Message]
+    assert message_indexes["ix_message_phone_sent_at"] == ["phone_number", "sent_at", "message_id"]
+    assert "ix_message_twilio_sid" in message_indexes
+    assert "ix_usage_twilio_sid" in meta.indexes[Usage]
+    assert "ix_test_case_run_id" in meta.indexes[TestCase]
@@ -2,8 +2,11 @@ import types
 from datetime import datetime
 
 import pytest
+from sqlalchemy import inspect as sa_inspect
+from twilio.base.exceptions import TwilioRestException
 
 import reach_out
+from models import Phone
 from reach_out import ReachOut
 
 
@@ -30,6 +33,13 @@ class DummyGPT:
     def insert_with_db_instance(self, db_instance, body, user, twilio_sid=None):
         self.logged.append((db_instance, body, user.phone_number, twilio_sid))
 
+    def add_to_context(self, phone, role, content):
+        self.context.setdefault(phone, []).append({"role": role, "content": content})
+
+    def log_many_with_db_instance(self, db_instance, replies):
+        for phone, body, sent_at in replies:
+            self.logged.append((db_instance, body, phone, sent_at))
+
 
 class DummyUserContext:
     def __init__(self, phone, reply="reply"):
@@ -61,11 +71,14 @@ class DummyExecuteResult:
 class FakeSession:
     def __init__(self):
         self.objects = []
+        self._seen = set()
         self._next_run_id = 1
         self.executed = []
 
     def add(self, obj):
-        if obj not in self.objects:
+        # Identity set instead of a list scan, matching Session.add's identity semantics
+        if id(obj) not in self._seen:
+            self._seen.add(id(obj))
             self.objects.append(obj)
 
     def flush(self):
@@ -163,6 +176,16 @@ def test_to_mapping_collects_attrs():
     assert "_private" not in mapping
 
 
+def test_to_mapping_orm_row_uses_mapped_columns_only():
+    phone = Phone(phone_number="5551234567")
+
+    mapping = ReachOut._to_mapping(phone)
+
+    assert mapping == {attr.key: getattr(phone, attr.key) for attr in sa_inspect(Phone).column_attrs}
+    assert mapping["phone_number"] == "5551234567"
+    assert "fsm_state" not in mapping
+
+
 def test_coerce_services_handles_types():
     assert ReachOut._coerce_services(None) == []
     assert ReachOut._coerce_services("a, b") == ["a", "b"]
@@ -182,6 +205,24 @@ def test_resolve_message_uses_template():
     assert msg == "Hello Alice"
 
 
+def test_resolve_message_formats_object_rows_lazily():
+    ro = ReachOut(DummyGPT(), DummyTwilio(), db_factory=DBFactory())
+    user = DummyUserContext("123", reply="fallback")
+
+    class Row:
+        greeting = "Hey"
+
+        def __init__(self):
+            self.name = "Bob"
+
+        @property
+        def broken(self):
+            raise RuntimeError("should not be read")
+
+    assert ro._resolve_message(user, Row(), "{greeting} {name}") == "Hey Bob"
+    assert ro._resolve_message(user, Row(), "{_private}") == "fallback"
+
+
 def test_resolve_message_falls_back_on_error():
     ro = ReachOut(DummyGPT(), DummyTwilio(), db_factory=DBFactory())
     user = DummyUserContext("123", reply="fallback")
@@ -303,6 +344,65 @@ def test_send_bulk_returns_summary(monkeypatch):
     assert run_db.closed
 
 
+def test_send_bulk_counts_active_conversations_only_near_limit(monkeypatch):
+    ro, gpt, _, _ = make_reach_out(monkeypatch, max_active=2)
+    ro._build_user_context = lambda _self, row: DummyUserContext(row["phone_number"])  # type: ignore[assignment]
+    calls = []
+
+    def count(db):
+        calls.append(db)
+        return 0
+
+    ro._count_active_conversations = count  # type: ignore[assignment]
+
+    rows = [{"phone_number": "111"}, {"phone_number": "222"}, {"phone_number": "333"}]
+    outcome = ro.send_bulk(rows)
+
+    assert outcome["summary"]["sent"] == 3
+    # All three outbound messages are logged on one extra connection, however many batches that takes
+    assert sorted(phone for _, _, phone, _ in gpt.logged) == ["111", "222", "333"]
+    assert len({db for db, _, _, _ in gpt.logged}) == 1
+    # Once up front, then again only when the local estimate reaches the limit before "333"
+    assert len(calls) == 2
+
+
+def test_send_bulk_collects_sends_while_rows_are_admitted(monkeypatch):
+    ro, gpt, _, _ = make_reach_out(monkeypatch)
+    ro._workers = 1
+    ro._build_user_context = lambda _self, row: DummyUserContext(row["phone_number"])  # type: ignore[assignment]
+    logged_at_admission = []
+
+    def extract_phone(row):
+        logged_at_admission.append(len(gpt.logged))
+        return ReachOut._extract_phone(row)
+
+    ro._extract_phone = extract_phone  # type: ignore[assignment]
+
+    ro.send_bulk([{"phone_number": str(n)} for n in range(6)])
+
+    # At most 2 * workers sends are outstanding, so row k is admitted after k - 2 have been logged
+    assert all(logged >= k - 2 for k, logged in enumerate(logged_at_admission))
+    # Each opener is in the GPT context and logged with the time it was sent
+    assert gpt.context["0"] == [{"role": "assistant", "content": "reply"}]
+    assert all(sent_at.tzinfo is not None for _, _, _, sent_at in gpt.logged)
+
+
+def test_send_bulk_recounts_active_conversations_at_checkpoints(monkeypatch):
+    ro, _, _, _ = make_reach_out(monkeypatch, max_active=10)
+    ro._workers = 1
+    ro._PROGRESS_EVERY = 1
+    ro._build_user_context = lambda _self, row: DummyUserContext(row["phone_number"])  # type: ignore[assignment]
+    counts = iter([0])
+    # Webhooks fill every slot right after the run starts
+    ro._count_active_conversations = lambda db: next(counts, 10)  # type: ignore[assignment]
+
+    outcome = ro.send_bulk([{"phone_number": str(n)} for n in range(10)])
+
+    # The local estimate alone would have admitted all ten rows; a checkpoint re-count stops it by row 3
+    assert outcome["summary"]["sent"] <= 2
+    assert outcome["summary"]["throttled"] >= 8
+
+
 def test_send_bulk_respects_outbound_toggle(monkeypatch):
     ro, _, twilio, _ = make_reach_out(monkeypatch)
     monkeypatch.setenv("OUTBOUND_LIVE_TOGGLE", "0")
@@ -319,3 +419,93 @@ def test_send_bulk_respects_outbound_toggle(monkeypatch):
 
     result = outcome["results"][0]
     assert result["reason"] == "outbound disabled"
+
+
+def test_send_bulk_paces_sends_to_configured_rate(monkeypatch):
+    ro, _, twilio, _ = make_reach_out(monkeypatch)
+    ro._send_interval = ro._base_send_interval = 0.5
+    ro._workers = 1  # the fake clock below is not thread-aware
+    ro._build_user_context = lambda _self, row: DummyUserContext(row["phone_number"])  # type: ignore[assignment]
+
+    clock = [100.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(reach_out.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(reach_out.time, "sleep", fake_sleep)
+
+    ro.send_bulk([{"phone_number": "111"}, {"phone_number": "222"}, {"phone_number": "333"}])
+
+    assert len(twilio.sent) == 3
+    assert sleeps == [0.5, 0.5]
+
+
+def test_send_bulk_commits_progress_periodically(monkeypatch):
+    ro, _, _, factory = make_reach_out(monkeypatch)
+    ro._PROGRESS_EVERY = 2
+    ro._build_user_context = lambda _self, row: DummyUserContext(row["phone_number"])  # type: ignore[assignment]
+    checkpoints = []
+
+    def commit(session):
+        run_log = next((obj for obj in session.objects if isinstance(obj, DummyReachOutRun)), None)
+        if run_log is not None:
+            checkpoints.append((run_log.processed, run_log.sent))
+
+    monkeypatch.setattr(FakeSession, "commit", commit)
+
+    ro.send_bulk([{"phone_number": str(n)} for n in range(5)])
+
+    # Checkpoints count finished sends, so none of them records progress without the sends behind it
+    *progress, final = checkpoints
+    assert progress
+    assert all(processed >= 2 and sent == processed for processed, sent in progress)
+    assert final == (5, 5)
+
+
+def test_rate_limit_backoff_is_capped_and_decays(monkeypatch):
+    class ThrottledTwilio(DummyTwilio):
+        throttled = True
+
+        def send_sms(self, to_phone: str, message: str):
+            if self.throttled:
+                raise TwilioRestException(429, "/Messages", msg="Too Many Requests")
+            return super().send_sms(to_phone, message)
+
+    twilio = ThrottledTwilio()
+    ro, _, _, _ = make_reach_out(monkeypatch, twilio=twilio)
+    ro._send_interval = ro._base_send_interval = 0.5
+    ro._pace_send = lambda: None
+    ro._build_user_context = lambda phone, row: DummyUserContext(phone)
+
+    for _ in range(10):
+        ro._send_one(None, "111", {}, None, False)
+    assert ro._send_interval == ReachOut._MAX_SEND_INTERVAL
+
+    twilio.throttled = False
+    for _ in range(50):
+        ro._send_one(None, "111", {}, None, False)
+    assert ro._send_interval == 0.5
+
+
+def test_send_bulk_records_crashed_rows_and_skips_duplicate_phones(monkeypatch):
+    ro, gpt, twilio, _ = make_reach_out(monkeypatch)
+    ro._build_user_context = lambda _self, row: DummyUserContext(row["phone_number"])  # type: ignore[assignment]
+
+    def resolve_message(user, row, template):
+        if user.phone_number == "222":
+            raise ValueError("bad template")
+        return "hi"
+
+    ro._resolve_message = resolve_message  # type: ignore[assignment]
+
+    outcome = ro.send_bulk([{"phone_number": "111"}, {"phone_number": "222"}, {"phone_number": "111"}])
+
+    results = outcome["results"]
+    assert [item["status"] for item in results] == ["sent", "error", "skipped"]
+    assert results[1] == {"run_id": outcome["run_id"], "phone": "222", "status": "error", "error": "bad template"}
+    assert results[2]["reason"] == "duplicate phone"
+    assert twilio.sent == [("111", "hi")]
+    assert [phone for _, _, phone, _ in gpt.logged] == ["111"]
@@ -3,6 +3,8 @@ import json
 from types import SimpleNamespace
 from unittest.mock import Mock
 import pytest
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
 
 from main_intent import tool_get_fsm_reply
 import gpt as gpt_module
@@ -22,37 +24,51 @@ class FakeUser:
         return f"TEMPLATE::{snap['state']}"
 
 
+@pytest.fixture(scope="module")
+def _shared_gpt():
+    # Building GPTClient sets up the OpenAI HTTP client; do that once for the module
+    return gpt_module.GPTClient()
+
+
+@pytest.fixture
+def gpt_client(_shared_gpt):
+    _shared_gpt._contexts.clear()
+    _shared_gpt._client = None
+    return _shared_gpt
+
+
 # OpenAI scripted client
-class ScriptedClient:
-    def __init__(self, responses):
-        self._responses = list(responses)
+class _Completions:
+    def __init__(self, outer):
+        self.outer = outer
+
+    def create(self, **kwargs):
+        if not self.outer._responses:
+            raise AssertionError("No scripted responses left")
+        return self.outer._responses.pop(0)
 
-        class _Chat:
-            def __init__(self, outer):
-                class _Completions:
-                    def __init__(self, outer):
-                        self.outer = outer
 
-                    def create(self, **kwargs):
-                        if not outer._responses:
-                            raise AssertionError("No scripted responses left")
-                        return outer._responses.pop(0)
+class _Chat:
+    def __init__(self, outer):
+        self.completions = _Completions(outer)
 
-                self.completions = _Completions(self)
 
+class ScriptedClient:
+    def __init__(self, responses):
+        self._responses = list(responses)
         self.chat = _Chat(self)
 
 
 def mk_tool_call(name, args=None, call_id="t1"):
-    return SimpleNamespace(
+    return ChatCompletionMessageToolCall(
         id=call_id,
         type="function",
-        function=SimpleNamespace(name=name, arguments=json.dumps(args or {}))
+        function=Function(name=name, arguments=json.dumps(args or {}))
     )
 
 
 def mk_message_with_tool_calls(tool_calls):
-    msg = SimpleNamespace(tool_calls=tool_calls, content=None)
+    msg = ChatCompletionMessage(role="assistant", tool_calls=tool_calls, content=None)
     return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
 
 
@@ -70,13 +86,12 @@ def test_tool_get_fsm_reply_returns_reply_and_snapshot():
 
 
 # ---------- 2) Usage inside generate_response: short-circuit when tool is called ----------
-def test_generate_response_short_circuits_on_get_fsm_reply(monkeypatch):
+def test_generate_response_short_circuits_on_get_fsm_reply(monkeypatch, gpt_client):
     # Script model to request get_fsm_reply immediately
     first = mk_message_with_tool_calls([mk_tool_call("get_fsm_reply", {}, "tc1")])
     client = ScriptedClient([first])
 
     # Stubs
-    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
     get_session = Mock(return_value=[])
     log_message_to_db = Mock()
 
@@ -84,7 +99,7 @@ def test_generate_response_short_circuits_on_get_fsm_reply(monkeypatch):
     monkeypatch.setattr(gpt_module, "get_session_messages_no_base_prompt", get_session, raising=True)
     monkeypatch.setattr(gpt_module, "log_message_to_db", log_message_to_db, raising=True)
 
-    gpt = gpt_module.GPTClient()
+    gpt = gpt_client
     gpt._client = client  # inject scripted client
 
     user = FakeUser()
@@ -100,17 +115,16 @@ def test_generate_response_short_circuits_on_get_fsm_reply(monkeypatch):
 
 
 # ---------- 3) Usage inside generate_response: forced fallback when no tools ----------
-def test_generate_response_forces_tool_when_no_tools(monkeypatch):
+def test_generate_response_forces_tool_when_no_tools(monkeypatch, gpt_client):
     first = mk_message_no_tools()  # model returns no tool_calls
     client = ScriptedClient([first])
 
-    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
     get_session = Mock(return_value=[])
     log_message_to_db = Mock()
     monkeypatch.setattr(gpt_module, "get_session_messages_no_base_prompt", get_session, raising=True)
     monkeypatch.setattr(gpt_module, "log_message_to_db", log_message_to_db, raising=True)
 
-    gpt = gpt_module.GPTClient()
+    gpt = gpt_client
     gpt._client = client
 
     user = FakeUser()
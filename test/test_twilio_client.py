@@ -0,0 +1,40 @@
+from twilio_test import TwilioSMSClient
+
+
+def test_rest_client_is_built_lazily():
+    client = TwilioSMSClient("AC123", "token", "MG123")
+
+    assert client._client is None
+    assert client.get_client() is client.get_client()
+
+
+def test_set_token_rotates_credentials_in_place():
+    client = TwilioSMSClient("AC123", "old-token", "MG123")
+    rest = client.get_client()
+
+    client.set_token("new-token")
+
+    assert client.get_client() is rest
+    assert rest.password == "new-token"
+    assert rest.auth == ("AC123", "new-token")
+
+
+def test_set_sid_rebuilds_client_on_next_use():
+    client = TwilioSMSClient("AC123", "token", "MG123")
+    rest = client.get_client()
+
+    client.set_sid("AC456")
+
+    rebuilt = client.get_client()
+    assert rebuilt is not rest
+    assert rebuilt.username == "AC456"
+    assert rebuilt.http_client is rest.http_client
+
+
+def test_http_pool_size_comes_from_env(monkeypatch):
+    monkeypatch.setenv("TWILIO_HTTP_POOL_SIZE", "48")
+    client = TwilioSMSClient("AC123", "token", "MG123")
+
+    adapter = client.get_client().http_client.session.get_adapter("https://api.twilio.com")
+
+    assert adapter._pool_maxsize == 48
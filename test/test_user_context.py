@@ -2,6 +2,8 @@ import pytest
 from types import SimpleNamespace
 from typing import Dict, List
 
+from sqlalchemy.dialects import postgresql
+
 import user_context as uc_mod
 from models import FSMState, Phone
 
@@ -30,6 +32,21 @@ class FakeSession:
             self.store.other.append(obj)
         return obj
 
+    def execute(self, stmt, params=None):
+        # Only the Phone/FSMState upserts go through execute; apply their ON CONFLICT semantics to the store
+        values = stmt.compile(dialect=postgresql.dialect()).construct_params(params)
+        self.store.executed.append(stmt)
+        if stmt.table.name == Phone.__tablename__:
+            self.store.phones.setdefault(values["phone_number"], Phone(**values))
+            return
+        values = {"phone_number": values["pn"], "statename": values["st"], "was_interested": values["wi"]}
+        state = self.store.states.get(values["phone_number"])
+        if state is None:
+            self.store.states[values["phone_number"]] = FSMState(**values)
+        else:
+            state.statename = values["statename"]
+            state.was_interested = bool(state.was_interested) or values["was_interested"]
+
     def flush(self):
         return None
 
@@ -45,6 +62,7 @@ class InMemoryStore:
         self.phones: Dict[str, Phone] = {}
         self.states: Dict[str, FSMState] = {}
         self.other: List[object] = []
+        self.executed: List[object] = []
         self.sessions: List[FakeSession] = []
 
 
@@ -214,29 +232,38 @@ def test_gpt_history_and_twilio_fields(db_store):
     user.clear_gpt_history()
     assert user.get_gpt_history() == []
 
-
-def test_reply_for_state_variants(db_store):
+    for i in range(uc_mod.UserContext._GPT_HISTORY_LIMIT + 5):
+        user.add_gpt_message("user", str(i))
+    history = user.get_gpt_history()
+    assert len(history) == uc_mod.UserContext._GPT_HISTORY_LIMIT
+    assert history[0]["content"] == "5"
+
+
+# (events fired from a fresh user, str method used to check the reply, expected text)
+_REPLY_PATH = ("receive_positive_response", "go_to_sqft", "receive_followup", "retry_confused")
+REPLY_CASES = [
+    (_REPLY_PATH[:0], "startswith", "Hey! Quick check-in"),
+    (_REPLY_PATH[:1], "__contains__", "square feet"),
+    (_REPLY_PATH[:2], "__contains__", "square footage"),
+    (_REPLY_PATH[:3], "__contains__", "We will reach out with a booking"),
+    (_REPLY_PATH[:4], "__contains__", "clarify"),
+]
+
+
+@pytest.mark.parametrize(
+    "events, check, expected",
+    REPLY_CASES,
+    ids=["start", "interested", "action_sqft", "follow_up", "confused"],
+)
+def test_reply_for_state_variants(db_store, events, check, expected):
     db_store(phone_present=True)
     user = uc_mod.UserContext(PHONE_NUMBER)
+    for event in events:
+        user.trigger_event(event)
 
-    snap = user.get_fsm_snapshot()
-    assert user.reply_for_state(snap).startswith("Hey! Quick check-in")
-
-    user.trigger_event("receive_positive_response")
-    snap = user.get_fsm_snapshot()
-    assert "square feet" in user.reply_for_state(snap)
-
-    user.trigger_event("go_to_sqft")
-    snap = user.get_fsm_snapshot()
-    assert "square footage" in user.reply_for_state(snap)
-
-    user.trigger_event("receive_followup")
-    snap = user.get_fsm_snapshot()
-    assert "We will reach out with a booking" in user.reply_for_state(snap)
+    reply = user.reply_for_state(user.get_fsm_snapshot())
 
-    user.trigger_event("retry_confused")
-    snap = user.get_fsm_snapshot()
-    assert "clarify" in user.reply_for_state(snap)
+    assert getattr(reply, check)(expected)
 
 
 def test_get_current_state_hydrates_interest_flag(db_store):
@@ -256,3 +283,43 @@ def test_get_current_state_promotes_interest_flag_when_missing(db_store):
     user.get_current_state()
 
     assert store.states[PHONE_NUMBER].was_interested is True
+
+
+def test_set_current_state_upserts_in_one_statement(db_store):
+    store = db_store(phone_present=True, state_present=True, was_interested=True)
+    user = uc_mod.UserContext(PHONE_NUMBER)
+    user.fsm.was_ever_interested = False
+    executed = len(store.executed)
+
+    user.set_current_state("confused")
+
+    assert len(store.executed) == executed + 1
+    assert store.states[PHONE_NUMBER].statename == "confused"
+    # The persisted interest flag never flips back off
+    assert store.states[PHONE_NUMBER].was_interested is True
+
+
+def test_get_current_state_skips_db_while_in_sync(db_store):
+    store = db_store(phone_present=True, state_present=True, state_name="interested")
+    user = uc_mod.UserContext(PHONE_NUMBER)
+    opened = len(store.sessions)
+
+    assert user.get_current_state() == "interested"
+    assert len(store.sessions) == opened
+
+    # Another writer moved the row; only an explicit refresh picks that up
+    store.states[PHONE_NUMBER].statename = "stop"
+    assert user.get_current_state() == "interested"
+    assert user.get_current_state(refresh=True) == "stop"
+
+
+def test_init_bootstraps_in_one_session(db_store):
+    store = db_store(phone_present=False)
+
+    uc_mod.UserContext(PHONE_NUMBER)
+
+    assert len(store.sessions) == 1
+    assert store.sessions[0].commits == 1
+    assert PHONE_NUMBER in store.phones
+    assert PHONE_NUMBER in store.states
+
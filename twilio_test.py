@@ -1,17 +1,42 @@
+import os
+
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
 from twilio.request_validator import RequestValidator
 from twilio.rest import Client
 
 
+def _http_pool_size() -> int:
+    try:
+        parsed = int(os.getenv("TWILIO_HTTP_POOL_SIZE", "32"))
+    except (TypeError, ValueError):
+        return 32
+    return max(parsed, 1)
+
+
 class TwilioSMSClient:
     def __init__(self, account_sid: str, auth_token: str, messaging_sid: str):
         self._account_sid = account_sid
         self._auth_token = auth_token
         self._messaging_sid = messaging_sid
-        self._client = Client(account_sid, auth_token)
-        self._validator = RequestValidator(auth_token) if auth_token else None
+        # Built on first use so webhook-only and settings-only callers never construct the REST client
+        self._client: Client | None = None
+        self._validator: RequestValidator | None = None
+        # Outlives client rebuilds so a SID change keeps the pooled connections to api.twilio.com
+        self._http_client: TwilioHttpClient | None = None
+
+    def _rest_client(self) -> Client:
+        if self._client is None:
+            if self._http_client is None:
+                self._http_client = TwilioHttpClient()
+                # The stock adapter keeps min(32, cpu+4) connections; size it so bursts of concurrent
+                # sends reuse warm TLS connections instead of opening and discarding extra ones
+                self._http_client.session.mount("https://", HTTPAdapter(pool_maxsize=_http_pool_size()))
+            self._client = Client(self._account_sid, self._auth_token, http_client=self._http_client)
+        return self._client
 
     def send_sms(self, to_phone: str, message: str):
-        twilio_message = self._client.messages.create(
+        twilio_message = self._rest_client().messages.create(
             messaging_service_sid=self._messaging_sid,
             to=to_phone,
             body=message
@@ -35,22 +60,26 @@ class TwilioSMSClient:
         if not (self._account_sid and self._auth_token):
             raise RuntimeError("Twilio credentials are not fully configured.")
         # Fetch account data to ensure the SID/token pair is usable
-        self._client.api.accounts(self._account_sid).fetch()
+        self._rest_client().api.accounts(self._account_sid).fetch()
 
     def get_client(self):
-        return self._client
+        return self._rest_client()
 
     def get_sid(self):
         return self._account_sid
 
     def set_sid(self, new_sid: str):
         self._account_sid = new_sid
-        self._client = Client(self._account_sid, self._auth_token)
+        # The client caches account-scoped resources under the old SID, so rebuild it on next use
+        self._client = None
 
     def get_token(self):
         return self._auth_token
 
     def set_token(self, new_token: str):
         self._auth_token = new_token
-        self._client = Client(self._account_sid, self._auth_token)
-        self._validator = RequestValidator(new_token) if new_token else None
+        if self._client is not None:
+            # Rotate in place so the client's HTTP session and its pooled connections survive
+            self._client.password = new_token
+            self._client.auth = (self._client.username, new_token)
+        self._validator = None
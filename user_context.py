@@ -1,5 +1,9 @@
 import logging
-from typing import Dict, List, Optional
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from db import DB
 from fsm import IntentionFlow
@@ -8,15 +12,58 @@ from models import FSMState, Phone
 
 logger = logging.getLogger(__name__)
 
+# Canned reply per FSM state
+_STATE_REPLIES = {
+    "start": "Hey! Quick check-in—are you still seeing any pest activity?",
+    "interested": "Great—roughly how many square feet is the area you want serviced?",
+    "action_sqft": "Please let me know the square footage of your property.",
+    "follow_up": "Thanks I've noted those details. We will reach out with a booking",
+    "done": "All set—thanks! We will reach out if anything is needed",
+    "not_interested": "Thank you, no problem. Bye",
+    "pause": "Let's pause for now. Ping me 'resume' when you're ready.",
+    "stop": "You're opted out",
+    "confused": "Sorry, could you clarify?",
+}
+_FALLBACK_REPLY = "I didn't catch that, mind rephrasing?"
+
+# Built once with bound parameters so every set_current_state reuses the same statement object.
+# The interest flag only ever latches on.
+_FSM_STATE_UPSERT = pg_insert(FSMState).values(
+    phone_number=bindparam("pn"),
+    statename=bindparam("st"),
+    was_interested=bindparam("wi"),
+)
+_FSM_STATE_UPSERT = _FSM_STATE_UPSERT.on_conflict_do_update(
+    index_elements=[FSMState.phone_number],
+    set_={
+        "statename": _FSM_STATE_UPSERT.excluded.statename,
+        "was_interested": FSMState.was_interested | _FSM_STATE_UPSERT.excluded.was_interested,
+    },
+)
+
 
 class UserContext:
+    _GPT_HISTORY_LIMIT = 20
+    # High-level intent -> FSM trigger, used by change_state_from_intent
+    _INTENT_MAP = {
+        "yes": "receive_positive_response",
+        "no": "receive_negative_response",
+        "stop": "user_stopped",
+        "confused": "retry_confused",
+        "resume": "resume_flow",
+        "sqft_ready": "go_to_sqft",
+        "followup": "receive_followup",
+        "complete": "complete_flow",
+    }
+
     def __init__(self, phone_number: str):
         self.phone_number = phone_number
         self.twilio_data: Dict[str, Optional[str]] = {
             "last_sid": None,
             "last_message": None
         }
-        self.gpt_history: List[Dict[str, str]] = []  # [{role: ..., content: ...}]
+        # Rolling window of [{role: ..., content: ...}]; oldest turns drop off past the limit
+        self.gpt_history: Deque[Dict[str, str]] = deque(maxlen=self._GPT_HISTORY_LIMIT)
         self.user_data: Dict[str, Optional[str]] = {
             "name": None,
             "previous_services": None,
@@ -24,10 +71,11 @@ class UserContext:
             "last_service": None
         }
         self._phone_number = phone_number
-        self._ensure_phone_in_db()
+        # (statename, was_interested) last read from or written to fsm_state by this instance
+        self._synced: Optional[tuple] = None
         self.fsm = IntentionFlow(name=phone_number)
-        # Ensure in-memory FSM reflects persisted state (and inserts a row if missing)
-        self.get_current_state()
+        # Ensure the phone row exists and the in-memory FSM reflects persisted state
+        self._bootstrap()
 
     def trigger_event(self, event_name: str, verbose=False, **kwargs):
         """
@@ -35,8 +83,8 @@ class UserContext:
         event_name should match the trigger name in IntentionFlow.
         Example: 'receive_positive_response', 'go_to_sqft', etc.
         """
-        if hasattr(self.fsm, event_name):
-            trigger_fn = getattr(self.fsm, event_name)
+        trigger_fn = getattr(self.fsm, event_name, None)
+        if trigger_fn is not None:
             if verbose:
                 logger.info("FSM event triggered: %s", event_name)
             # Fire transition on the in-memory FSM
@@ -58,18 +106,7 @@ class UserContext:
         """
         Map a high-level intent string to an FSM trigger.
         """
-        intent_map = {
-            "yes": "receive_positive_response",
-            "no": "receive_negative_response",
-            "stop": "user_stopped",
-            "confused": "retry_confused",
-            "resume": "resume_flow",
-            "sqft_ready": "go_to_sqft",
-            "followup": "receive_followup",
-            "complete": "complete_flow",
-        }
-
-        trigger = intent_map.get(intent)
+        trigger = self._INTENT_MAP.get(intent)
         if not trigger:
             raise ValueError(f"No trigger mapped for intent '{intent}'")
 
@@ -85,67 +122,85 @@ class UserContext:
         session = db_connection.session
 
         try:
-            state = session.get(FSMState, self._phone_number)
-            if state:
-                state.statename = state_name
-                state.was_interested = bool(state.was_interested) or was_interested_flag
-            else:
-                state = FSMState(
-                    phone_number=self._phone_number,
-                    statename=state_name,
-                    was_interested=was_interested_flag,
-                )
-                session.add(state)
+            # Single round trip instead of SELECT then UPDATE/INSERT
+            session.execute(
+                _FSM_STATE_UPSERT,
+                {"pn": self._phone_number, "st": state_name, "wi": was_interested_flag},
+            )
             session.commit()
+            self._synced = (state_name, was_interested_flag)
         finally:
             db_connection.close()
 
-    def get_current_state(self) -> str:
+    def get_current_state(self, refresh: bool = False) -> str:
         """
         Return the current FSM state and ensure the DB reflects it.
         If the row doesn't exist it is inserted; if it exists but is
         different from the in-memory FSM state, it is updated.
+        Skips the DB when nothing changed in memory since this instance last
+        read or wrote the row; pass refresh=True to re-read it regardless.
         """
+        if not refresh and self._synced == self._memory_state():
+            return self.fsm.state
+
         db_connection = DB()
         session = db_connection.session
 
         try:
-            state = session.get(FSMState, self._phone_number)
-            if state is None:
-                state = FSMState(
-                    phone_number=self._phone_number,
-                    statename=self.fsm.state,
-                    was_interested=bool(getattr(self.fsm, "was_ever_interested", False)),
-                )
-                session.add(state)
+            if self._sync_state(session):
                 session.commit()
-                return state.statename
+            return self.fsm.state
+        finally:
+            db_connection.close()
 
-            if state.statename and state.statename != self.fsm.state:
-                self.fsm.state = state.statename
+    def _sync_state(self, session) -> bool:
+        """
+        Reconcile the in-memory FSM with this number's fsm_state row inside
+        ``session``. Returns True when rows were added or changed and the
+        caller needs to commit.
+        """
+        state = session.get(FSMState, self._phone_number)
+        if state is None:
+            state = FSMState(
+                phone_number=self._phone_number,
+                statename=self.fsm.state,
+                was_interested=bool(getattr(self.fsm, "was_ever_interested", False)),
+            )
+            session.add(state)
+            self._synced = (state.statename, bool(state.was_interested))
+            return True
 
-            updated = False
-            if state.was_interested:
-                self.fsm.was_ever_interested = True
-            elif getattr(self.fsm, "was_ever_interested", False):
-                state.was_interested = True
-                updated = True
+        if state.statename and state.statename != self.fsm.state:
+            self.fsm.state = state.statename
 
-            if updated:
-                session.commit()
+        updated = False
+        if state.was_interested:
+            self.fsm.was_ever_interested = True
+        elif getattr(self.fsm, "was_ever_interested", False):
+            state.was_interested = True
+            updated = True
 
-            return self.fsm.state
-        finally:
-            db_connection.close()
+        self._synced = self._memory_state()
+        return updated
+
+    def _memory_state(self) -> tuple:
+        return self.fsm.state, bool(getattr(self.fsm, "was_ever_interested", False))
 
-    def _ensure_phone_in_db(self):
+    def _bootstrap(self):
+        """
+        Make sure the phone row exists and load (or create) its fsm_state row,
+        all in one session and one commit.
+        """
+        stmt = pg_insert(Phone).values(phone_number=self._phone_number).on_conflict_do_nothing(
+            index_elements=[Phone.phone_number]
+        )
         db_connection = DB()
         session = db_connection.session
 
         try:
-            if session.get(Phone, self._phone_number) is None:
-                session.add(Phone(phone_number=self._phone_number))
-                session.commit()
+            session.execute(stmt)
+            self._sync_state(session)
+            session.commit()
         finally:
             db_connection.close()
 
@@ -164,10 +219,10 @@ class UserContext:
         self.gpt_history.append({"role": role, "content": content})
 
     def get_gpt_history(self) -> List[Dict[str, str]]:
-        return self.gpt_history
+        return list(self.gpt_history)
 
     def clear_gpt_history(self):
-        self.gpt_history = []
+        self.gpt_history.clear()
 
     # -------- USER DATA --------
     def set_user_info(self, name: str, services: List[str], days_since: int, last_service: str):
@@ -192,24 +247,4 @@ class UserContext:
         return self.user_data
 
     def reply_for_state(self, snap: dict) -> str:
-        state = snap.get("flow_state", "start")
-        if state == "start":
-            return "Hey! Quick check-in—are you still seeing any pest activity?"
-        if state == "interested":
-            return "Great—roughly how many square feet is the area you want serviced?"
-        if state == "action_sqft":
-            return "Please let me know the square footage of your property."
-        if state == "follow_up":
-            return "Thanks I've noted those details. We will reach out with a booking"
-        if state == "done":
-            return "All set—thanks! We will reach out if anything is needed"
-        if state == "not_interested":
-            return "Thank you, no problem. Bye"
-        if state == "pause":
-            return "Let's pause for now. Ping me 'resume' when you're ready."
-        if state == "stop":
-            return "You're opted out"
-        if state == "confused":
-            count = snap.get("confused_count", 0)
-            return f"Sorry, could you clarify?"
-        return "I didn't catch that, mind rephrasing?"
+        return _STATE_REPLIES.get(snap.get("flow_state", "start"), _FALLBACK_REPLY)
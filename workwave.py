@@ -1,47 +1,73 @@
 import base64
 import logging
 import os
+import threading
+import time
 
+import orjson
 import requests
 from dotenv import load_dotenv
 
 from logging_config import configure_logging
 
-# Initialize logging before performing any operations
-configure_logging()
 logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
 
-client_id = os.getenv("pest_pac_Client_ID")
-client_secret = os.getenv("pest_pac_Client_Secret")
-username = os.getenv("my_workwave_id")           # Optional: add to .env
-password = os.getenv("my_workwave_password")     # Optional: add to .env
-
 endpoint = "https://is.workwave.com/oauth2/token?scope=openid"
 
-auth_header = base64.b64encode(f"{client_id}:{client_secret}".encode("utf-8")).decode("utf-8")
+# Refresh this many seconds before the server-reported expiry
+_EXPIRY_MARGIN_SECONDS = 60
+
+# Reused across refreshes so the TLS connection to the token endpoint stays warm
+_http = requests.Session()
+_token_lock = threading.Lock()
+_token_cache = {"access_token": None, "refresh_token": None, "expires_at": 0.0}
 
-headers = {
-    "Authorization": f"Bearer {auth_header}",
+# Client credentials don't change at runtime, so the Basic auth header is encoded once
+_BASIC_AUTH = "Basic " + base64.b64encode(
+    f"{os.getenv('pest_pac_Client_ID')}:{os.getenv('pest_pac_Client_Secret')}".encode("utf-8")
+).decode("utf-8")
+_TOKEN_HEADERS = {
+    "Authorization": _BASIC_AUTH,
     "Content-Type": "application/x-www-form-urlencoded"
 }
 
-data = {
-    "grant_type": "password",
-    "username": username,
-    "password": password
-}
 
-response = requests.post(endpoint, headers=headers, data=data)
-
-if response.status_code == 200:
-    json_response = response.json()
-    access_token = json_response.get("access_token")
-    refresh_token = json_response.get("refresh_token")
-    expires_in_seconds = json_response.get("expires_in")
-    logger.info("Token expires in %s seconds", expires_in_seconds)
-    logger.info("WorkWave token request succeeded")
-else:
-    raise Exception(f"Error getting token: {response.text}")
+def _request_token() -> dict:
+    data = {
+        "grant_type": "password",
+        "username": os.getenv("my_workwave_id"),           # Optional: add to .env
+        "password": os.getenv("my_workwave_password"),     # Optional: add to .env
+    }
+
+    response = _http.post(endpoint, headers=_TOKEN_HEADERS, data=data)
+    if response.status_code != 200:
+        raise Exception(f"Error getting token: {response.text}")
+    return orjson.loads(response.content)
+
+
+def get_workwave_token() -> str:
+    """Return a WorkWave access token, fetching a new one only when the cached token is about to expire."""
+    with _token_lock:
+        if _token_cache["access_token"] and time.monotonic() < _token_cache["expires_at"]:
+            return _token_cache["access_token"]
+
+        json_response = _request_token()
+        expires_in_seconds = json_response.get("expires_in")
+        try:
+            ttl = max(float(expires_in_seconds) - _EXPIRY_MARGIN_SECONDS, 0.0)
+        except (TypeError, ValueError):
+            ttl = 0.0
+        _token_cache["access_token"] = json_response.get("access_token")
+        _token_cache["refresh_token"] = json_response.get("refresh_token")
+        _token_cache["expires_at"] = time.monotonic() + ttl
+        logger.info("Token expires in %s seconds", expires_in_seconds)
+        logger.info("WorkWave token request succeeded")
+        return _token_cache["access_token"]
+
+
+if __name__ == "__main__":
+    configure_logging()
+    get_workwave_token()